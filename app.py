@@ -1,9 +1,12 @@
 import streamlit as st
 from PIL import Image
 import io
-import os
-from backend.img_ingred_detection import extract_ingredients
-from backend.recipe_generator import generate_chef_response
+# Light imports only: detection and generation (torch, sentence-transformers,
+# the vector store, llama.cpp) are imported by the background startup thread
+from backend import startup
+from backend.model_registry import registry
+from backend.llm import scheduler_stats
+from backend.llm_scheduler import SchedulerBusy, GenerationTimeout
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -12,15 +15,15 @@ st.set_page_config(
     layout="centered"
 )
 
-# --- DATABASE CHECK ---
-if not os.path.exists("./chroma_db"):
-    try:
-        if os.path.exists("scripts/seed_chroma.py"):
-            st.toast("🌱 First run: Seeding database...", icon="⚙️")
-            from scripts.seed_chroma import seed
-            seed()
-    except Exception:
-        pass
+# --- STARTUP ---
+@st.cache_resource
+def _boot():
+    # Once per process, in the background: heavy imports, seeding an empty
+    # vector store, then the models listed in MODEL_WARMUP
+    startup.start()
+    return True
+
+_boot()
 
 # --- SESSION STATE ---
 if "ingredients_list" not in st.session_state:
@@ -31,6 +34,8 @@ if "recipe_body" not in st.session_state:
     st.session_state.recipe_body = None
 if "rag_recommendations" not in st.session_state:
     st.session_state.rag_recommendations = []
+if "recipe_metrics" not in st.session_state:
+    st.session_state.recipe_metrics = None
 
 # --- PROFESSIONAL CSS THEME ---
 st.markdown("""
@@ -122,15 +127,57 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def render_recipe_card(title, body):
+    return f"""
+    <div class='recipe-card'>
+        <span class='badge'>AI Generated</span>
+        <div class='recipe-title'>{title}</div>
+        {body}
+    </div>
+    """
+
 # --- MAIN UI ---
 st.title("👨‍🍳 AI Chef Pro")
 st.write("Upload a photo or enter ingredients to generate a chef-quality recipe.")
+startup.mark_first_paint()
+
+# --- READINESS ---
+@st.fragment(run_every=1.0)
+def readiness_banner():
+    status = startup.status()
+    if status["done"]:
+        st.rerun()  # enable the buttons; this fragment is not rendered again
+    seed = status["seed"]
+    if status["phase"] == "seeding" and seed:
+        fraction = min(1.0, seed["line"] / seed["total"]) if seed["total"] else 0.0
+        st.progress(fraction, text=f"🌱 First run: seeding the recipe database ({seed['added']} recipes)...")
+    else:
+        st.info("⏳ Warming up the kitchen... you can start listing ingredients meanwhile.")
+
+boot = startup.status()
+booting = not boot["done"]
+if booting:
+    readiness_banner()
+elif boot["phase"] == "failed":
+    st.error(f"⚠️ Startup did not complete: {boot['error']}")
 
 # --- SIDEBAR ---
 with st.sidebar:
     st.header("Settings")
     prefs = st.text_input("Dietary Preferences", placeholder="e.g. Vegetarian, Keto")
+    fresh = st.checkbox("Fresh recipe (skip cache)", value=False,
+                        help="Always generate a new recipe instead of reusing a cached one.")
     st.info("💡 **Tip:** Ensure good lighting for better detection.")
+    with st.expander("Model status"):
+        st.json(boot)
+        st.json(registry.stats())
+        st.json(scheduler_stats())
+        if boot["phase"] == "ready":
+            # Both modules are already imported by the startup thread
+            from backend.recipe_generator import get_response_cache
+            from backend.img_ingred_detection import get_detection_cache
+            caches = {"response_cache": get_response_cache(), "detection_cache": get_detection_cache()}
+            st.json({name: cache.stats() for name, cache in caches.items() if cache is not None})
 
 # --- INPUT TABS ---
 tabs = st.tabs(["📸 Photo Input", "📝 Manual Input"])
@@ -142,7 +189,8 @@ with tabs[0]:
     if uploaded:
         st.image(uploaded, caption="Uploaded Image", width="stretch")
         
-        if st.button("🔍 Detect Ingredients", key="btn_detect"):
+        if st.button("🔍 Detect Ingredients", key="btn_detect", disabled=booting):
+            from backend.img_ingred_detection import extract_ingredients
             with st.spinner("Analyzing image..."):
                 uploaded.seek(0)
                 img_bytes = uploaded.read()
@@ -171,33 +219,49 @@ final_ingredients_str = st.text_area(
 )
 st.session_state.ingredients_list = final_ingredients_str
 
-if st.button("🔥 Cook Now!", type="primary"):
+if st.button("🔥 Cook Now!", type="primary", disabled=booting):
+    from backend.recipe_generator import stream_chef_response
     ingredients_clean = [x.strip() for x in final_ingredients_str.split(",") if x.strip()]
     
     if not ingredients_clean:
         st.error("Please enter at least one ingredient.")
     else:
-        with st.spinner("👨‍🍳 The Chef is designing your recipe..."):
-            # UNPACKING 3 VALUES
-            title, body, rag_recs = generate_chef_response(ingredients_clean, prefs)
-            
-            st.session_state.recipe_title = title
-            st.session_state.recipe_body = body
-            st.session_state.rag_recommendations = rag_recs
-        st.rerun()
+        # Render the card progressively as each line of the recipe completes
+        status = st.empty()
+        card = st.empty()
+        status.info("👨‍🍳 The Chef is designing your recipe...")
+        try:
+            for event in stream_chef_response(ingredients_clean, prefs, fresh=fresh):
+                card.markdown(render_recipe_card(event["title"], event["body"]), unsafe_allow_html=True)
+                if event["done"]:
+                    st.session_state.recipe_title = event["title"]
+                    st.session_state.recipe_body = event["body"]
+                    st.session_state.rag_recommendations = event["rag"]
+                    st.session_state.recipe_metrics = event["metrics"]
+        except SchedulerBusy:
+            status.warning("🔥 The kitchen is busy right now. Please try again in a moment.")
+        except GenerationTimeout:
+            status.error("⏱️ The recipe took too long to generate. Please try again.")
+        else:
+            status.empty()
+            st.rerun()
 
 # --- RESULTS DISPLAY ---
 if st.session_state.recipe_body:
     st.divider()
     
     # 1. RENDER MAIN RECIPE CARD
-    st.markdown(f"""
-    <div class='recipe-card'>
-        <span class='badge'>AI Generated</span>
-        <div class='recipe-title'>{st.session_state.recipe_title}</div>
-        {st.session_state.recipe_body}
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(
+        render_recipe_card(st.session_state.recipe_title, st.session_state.recipe_body),
+        unsafe_allow_html=True
+    )
+    metrics = st.session_state.recipe_metrics
+    if metrics and metrics.get("cached"):
+        st.caption("Served from the recipe cache · tick 'Fresh recipe' for a new one")
+    elif metrics and metrics.get("first_content_s") is not None:
+        st.caption(f"First content in {metrics['first_content_s']:.1f}s · "
+                   f"full recipe in {metrics['total_s']:.1f}s · "
+                   f"{metrics['prompt_tokens']} prompt / {metrics['completion_tokens']} completion tokens")
 
     # 2. RAG RECOMMENDATIONS
     if st.session_state.rag_recommendations:
@@ -0,0 +1,201 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from .config import CHROMA_DIR, EMBED_MODEL, VECTOR_BACKEND, VECTOR_STORE_DIR
+from . import rag_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Kept next to the store it describes, so switching backends starts afresh
+_STORE_DIR = VECTOR_STORE_DIR if VECTOR_BACKEND == "numpy" else CHROMA_DIR
+DEFAULT_CHECKPOINT = os.path.join(_STORE_DIR, ".seed_checkpoint.json")
+
+# Per-process encoder used by the pool workers
+_worker_model = None
+
+
+def iter_records(path: str, start_line: int = 0) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    Streams (line_no, record) from a plain or gzipped JSONL file without
+    loading it into memory. Lines before `start_line` are skipped; invalid
+    JSON yields a None record so callers can count it.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh):
+            if line_no < start_line:
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_no, None
+
+
+def normalize_record(obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Applies the seed file conventions; None if the recipe has no text."""
+    # Use provided ID, or generate one from title if missing
+    title = obj.get("title", "Untitled Recipe")
+    rid = str(obj.get("id") or title[:12].replace(" ", "_"))
+    # Some datasets use 'text' others use 'instructions'
+    text = obj.get("text") or obj.get("instructions") or ""
+    if not text:
+        return None
+    ingredients = obj.get("ingredients", [])
+    return {
+        "id": rid,
+        "title": title,
+        "text": text,
+        "ingredients": ingredients,
+        "content_hash": recipe_hash(title, text, ingredients),
+    }
+
+
+def recipe_hash(title: str, text: str, ingredients: List[str], model: str = EMBED_MODEL) -> str:
+    # The model is part of the hash so a model change re-embeds every recipe
+    blob = json.dumps([model, title, text, ingredients], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()
+
+
+def _init_worker(threads: int):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+    # Split the cores between workers instead of oversubscribing them
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(EMBED_MODEL)
+
+
+def _encode_worker(texts: List[str]) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=128, convert_to_numpy=True)
+
+
+def _new_state(source: str) -> Dict[str, Any]:
+    return {"source": os.path.abspath(source), "line": 0, "added": 0, "skipped": 0, "invalid": 0}
+
+
+def _counts(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: state[k] for k in ("added", "skipped", "invalid", "line")}
+
+
+def _read_checkpoint(path: str, source: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        if state.get("source") == os.path.abspath(source):
+            return state
+    except (OSError, ValueError):
+        pass
+    return _new_state(source)
+
+
+def _write_checkpoint(path: str, state: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+    os.replace(tmp, path)
+
+
+def _chunks(records: Iterator[Tuple[int, Optional[Dict[str, Any]]]], size: int, state: Dict[str, Any]):
+    """Groups valid records into chunks of `size`, de-duplicating ids."""
+    chunk: Dict[str, Dict[str, Any]] = {}
+    last_line = state["line"]
+    for line_no, obj in records:
+        last_line = line_no + 1
+        record = normalize_record(obj) if isinstance(obj, dict) else None
+        if record is None:
+            state["invalid"] += 1
+            continue
+        # Last occurrence of an id wins, as it would with one upsert per line
+        chunk.pop(record["id"], None)
+        chunk[record["id"]] = record
+        if len(chunk) >= size:
+            yield list(chunk.values()), last_line
+            chunk = {}
+    if chunk:
+        yield list(chunk.values()), last_line
+    else:
+        yield [], last_line
+
+
+def bulk_load(path: str, batch_size: int = 1024, workers: int = 1, resume: bool = True,
+              checkpoint_path: Optional[str] = None,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Streams a (gzipped) JSONL recipe file into the vector store.
+
+    Recipes are encoded `batch_size` at a time, across `workers` processes
+    when > 1, while the main process writes finished chunks with bulk
+    upserts. Progress is checkpointed after every chunk so an interrupted
+    run resumes where it stopped, and recipes whose content hash matches
+    what is already stored are skipped. `progress`, if given, receives the
+    running counts (added, skipped, invalid, line) after every chunk.
+    """
+    checkpoint_path = checkpoint_path or DEFAULT_CHECKPOINT
+    state = _read_checkpoint(checkpoint_path, path) if resume else _new_state(path)
+    if state["line"]:
+        logger.info(f"Resuming {path} from line {state['line']}")
+
+    pool = None
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,))
+
+    def encode(texts: List[str]):
+        if pool is not None:
+            return pool.submit(_encode_worker, texts)
+        emb_model, _ = rag_pipeline._get_resources()
+        return emb_model.encode(texts, batch_size=128, convert_to_numpy=True)
+
+    def flush(records: List[Dict[str, Any]], pending, line: int):
+        if records:
+            vectors = pending.result() if pool is not None else pending
+            rag_pipeline.upsert_recipes(
+                ids=[r["id"] for r in records],
+                titles=[r["title"] for r in records],
+                texts=[r["text"] for r in records],
+                ingredients=[r["ingredients"] for r in records],
+                embeddings=vectors,
+                content_hashes=[r["content_hash"] for r in records],
+            )
+            state["added"] += len(records)
+        state["line"] = line
+        _write_checkpoint(checkpoint_path, state)
+        if progress is not None:
+            progress(_counts(state))
+
+    # Keep a few chunks encoding ahead of the writer
+    in_flight = deque()
+    try:
+        for chunk, line in _chunks(iter_records(path, state["line"]), batch_size, state):
+            stored = rag_pipeline.get_content_hashes([r["id"] for r in chunk]) if chunk else {}
+            fresh = [r for r in chunk if stored.get(r["id"]) != r["content_hash"]]
+            state["skipped"] += len(chunk) - len(fresh)
+
+            pending = None
+            if fresh:
+                pending = encode([rag_pipeline.semantic_string(r["title"], r["ingredients"]) for r in fresh])
+            in_flight.append((fresh, pending, line))
+            while len(in_flight) > max(1, workers):
+                flush(*in_flight.popleft())
+            logger.info(f"Seeded {state['added']} recipes ({state['skipped']} unchanged)")
+        while in_flight:
+            flush(*in_flight.popleft())
+        # A finished run starts from the top next time; unchanged recipes
+        # are then skipped by their content hash
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return _counts(state)
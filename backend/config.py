@@ -11,4 +11,128 @@ CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_db")
 EMBED_MODEL = "all-MiniLM-L6-v2"
 
 # Collection name for recipes
-COLLECTION_NAME = "recipes"
\ No newline at end of file
+COLLECTION_NAME = "recipes"
+
+# Vision model used for ingredient detection
+CLIP_MODEL = "clip-ViT-B-32"
+
+# Directory for the memory-mapped CLIP vocabulary embedding cache
+VOCAB_CACHE_DIR = os.getenv("VOCAB_CACHE_DIR", "./.cache/vocab")
+
+# Optional JSON vocabulary file replacing the built-in ingredient list
+VOCAB_FILE = os.getenv("VOCAB_FILE")
+
+# Ingredient detection: worker threads shared by the CLIP and OCR stages
+DETECT_WORKERS = int(os.getenv("DETECT_WORKERS", "4"))
+
+# Per-stage deadlines (seconds) for a single-image detection request
+VISUAL_TIMEOUT_S = float(os.getenv("VISUAL_TIMEOUT_S", "20"))
+OCR_TIMEOUT_S = float(os.getenv("OCR_TIMEOUT_S", "5"))
+
+# Longest image side (pixels) handed to Tesseract; CLIP gets its own 224px view
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1600"))
+
+# Ingredient detection result cache: in-memory entries, optional SQLite
+# file (unset = memory only) and its size cap
+DETECT_CACHE_SIZE = int(os.getenv("DETECT_CACHE_SIZE", "256"))
+DETECT_CACHE_PATH = os.getenv("DETECT_CACHE_PATH")
+DETECT_CACHE_MAX_MB = float(os.getenv("DETECT_CACHE_MAX_MB", "64"))
+# Also key results by perceptual hash, so re-encoded or resized copies hit
+DETECT_CACHE_PHASH = os.getenv("DETECT_CACHE_PHASH", "1") == "1"
+
+# Visual detection mode: "full" (one whole-image embedding) or "tiled"
+# (overlapping grid crops + full frame, encoded in one batched pass)
+DETECT_MODE = os.getenv("DETECT_MODE", "full")
+DETECT_TILE_GRID = os.getenv("DETECT_TILE_GRID", "2x2")
+DETECT_TILE_OVERLAP = float(os.getenv("DETECT_TILE_OVERLAP", "0.25"))
+# How tile scores are merged: "max" (per-term max across tiles) or "topk"
+# (union of each tile's best DETECT_TILE_TOP_K hits)
+DETECT_TILE_MERGE = os.getenv("DETECT_TILE_MERGE", "max")
+DETECT_TILE_TOP_K = int(os.getenv("DETECT_TILE_TOP_K", "3"))
+
+# Retrieval caches: ingredient set -> query vector, and
+# (ingredient set, top_k, store generation) -> results
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+
+# Retrieval mode: "hybrid" (ingredient-overlap prefilter, then vector
+# rerank of at most HYBRID_CANDIDATES recipes) or "dense" (vector only)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "256"))
+
+# Vector store backend: "chroma" (ChromaDB in CHROMA_DIR) or "numpy"
+# (exact search over a memory-mapped file in VECTOR_STORE_DIR)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "./vector_store")
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+
+# Combined memory budget for loaded models in MB (0 = unlimited); least
+# recently used models are evicted when it is exceeded
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# Seconds before a model whose load failed is tried again; until then it
+# fails fast instead of reloading on every call
+MODEL_LOAD_RETRY_S = float(os.getenv("MODEL_LOAD_RETRY_S", "60"))
+# Comma-separated models to load at boot: any of clip, minilm, llm (empty = none)
+MODEL_WARMUP = [m.strip() for m in os.getenv("MODEL_WARMUP", "clip,minilm,llm").split(",") if m.strip()]
+
+# Snapshot the llama.cpp state after the static prompt prefix and restore
+# it per request, so only the per-request suffix is prefilled
+PREFIX_CACHE = os.getenv("PREFIX_CACHE", "1") == "1"
+
+# Opt-in generated recipe cache (SQLite file; unset = disabled). Keeps up to
+# RESPONSE_CACHE_VARIANTS recipes per request key to preserve variety
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "32"))
+RESPONSE_CACHE_TTL_H = float(os.getenv("RESPONSE_CACHE_TTL_H", "168"))
+
+# LLM request scheduler: model instances (cores are split between them),
+# waiting requests before new ones are rejected, and per-request deadline
+LLM_WORKERS = max(1, int(os.getenv("LLM_WORKERS", "1")))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "8"))
+LLM_REQUEST_TIMEOUT_S = float(os.getenv("LLM_REQUEST_TIMEOUT_S", "300"))
+
+# Recipe output: "text" (free-form, parsed line by line) or "json"
+# (grammar-constrained to a compact schema with bounded lists)
+RECIPE_OUTPUT_MODE = os.getenv("RECIPE_OUTPUT_MODE", "text")
+
+# Speculative decoding: "prompt_lookup" drafts LLM_DRAFT_TOKENS tokens at a
+# time by matching n-grams from the prompt (including retrieved recipe
+# text), "none" disables it
+LLM_DRAFT = os.getenv("LLM_DRAFT", "none")
+LLM_DRAFT_TOKENS = int(os.getenv("LLM_DRAFT_TOKENS", "2"))
+
+# Characters of each retrieved recipe's text added to the prompt context;
+# gives prompt lookup phrasing to copy from
+RAG_SNIPPET_CHARS = int(os.getenv("RAG_SNIPPET_CHARS", "300" if LLM_DRAFT == "prompt_lookup" else "0"))
+
+# LLM context window and the prompt's per-section token budgets. Recipe
+# context is trimmed (least relevant first) to keep MIN_COMPLETION_TOKENS
+# free for the answer; max_tokens shrinks to whatever the prompt leaves
+LLM_N_CTX = int(os.getenv("LLM_N_CTX", "2048"))
+PROMPT_INGREDIENT_TOKENS = int(os.getenv("PROMPT_INGREDIENT_TOKENS", "160"))
+PROMPT_PREFS_TOKENS = int(os.getenv("PROMPT_PREFS_TOKENS", "64"))
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "512"))
+MIN_COMPLETION_TOKENS = int(os.getenv("MIN_COMPLETION_TOKENS", "512"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "2"))
+
+# Request tracing and metrics (off unless one of these is set): TELEMETRY=1
+# keeps in-process metrics, TELEMETRY_JSONL appends one line per span and
+# TELEMETRY_PORT serves Prometheus text at http://127.0.0.1:<port>/metrics
+TELEMETRY = os.getenv("TELEMETRY", "0") == "1"
+TELEMETRY_JSONL = os.getenv("TELEMETRY_JSONL")
+TELEMETRY_PORT = int(os.getenv("TELEMETRY_PORT", "0"))
+
+# HTTP API (server.py) thread pools per stage and how many calls each may
+# have running or waiting before answering 503. Generation threads mostly
+# wait on the LLM scheduler, so that pool covers its workers and queue
+SERVER_DETECT_WORKERS = int(os.getenv("SERVER_DETECT_WORKERS", "2"))
+SERVER_RETRIEVE_WORKERS = int(os.getenv("SERVER_RETRIEVE_WORKERS", "4"))
+SERVER_GENERATE_WORKERS = int(os.getenv("SERVER_GENERATE_WORKERS", str(LLM_WORKERS + LLM_QUEUE_SIZE)))
+SERVER_MAX_PENDING = int(os.getenv("SERVER_MAX_PENDING", "32"))
+SERVER_MAX_UPLOAD_MB = float(os.getenv("SERVER_MAX_UPLOAD_MB", "10"))
+
+# Startup: seed the vector store in the background when it is empty (or a
+# previous seed was interrupted), from this JSONL file
+SEED_ON_START = os.getenv("SEED_ON_START", "1") == "1"
+SEED_DATA_FILE = os.getenv("SEED_DATA_FILE", "./seed_data/indian_recipes.jsonl")
\ No newline at end of file
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from PIL import Image
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image: Image.Image) -> str:
+    """
+    64-bit difference hash (dHash). Re-encoded, recompressed or resized
+    copies of the same photo almost always produce the same value.
+    """
+    small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    px = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+class DetectionCache:
+    """
+    Two-level cache for detection results: an in-memory LRU in front of an
+    optional SQLite file shared across processes.
+
+    Every key is prefixed with a fingerprint of the model, vocabulary and
+    thresholds, so changing any of them makes old entries unreachable; the
+    SQLite store also purges rows with other fingerprints when opened.
+    """
+
+    def __init__(self, fingerprint: str, maxsize: int = 256,
+                 path: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024):
+        self.fingerprint = fingerprint
+        self.memory = LRUCache(maxsize)
+        self.max_bytes = max_bytes
+        self.disk_hits = 0
+        self._db = None
+        self._lock = threading.Lock()
+        if path:
+            try:
+                self._open(path)
+            except sqlite3.Error as e:
+                logger.warning(f"Detection cache disabled on disk: {e}")
+                self._db = None
+
+    def _open(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS detections ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT, value TEXT,"
+            " size INTEGER, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON detections(last_access)")
+        self._db.execute("DELETE FROM detections WHERE fingerprint != ?", (self.fingerprint,))
+        self._db.commit()
+
+    def _key(self, kind: str, digest: str) -> str:
+        return f"{self.fingerprint}:{kind}:{digest}"
+
+    def get(self, kind: str, digest: str) -> Optional[Dict[str, Any]]:
+        key = self._key(kind, digest)
+        value = self.memory.get(key)
+        if value is not None or self._db is None:
+            return value
+
+        with self._lock:
+            row = self._db.execute("SELECT value FROM detections WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE detections SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        self.disk_hits += 1
+        value = json.loads(row[0])
+        self.memory.put(key, value)
+        return value
+
+    def put(self, kind: str, digest: str, value: Dict[str, Any]):
+        key = self._key(kind, digest)
+        self.memory.put(key, value)
+        if self._db is None:
+            return
+
+        payload = json.dumps(value)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?)",
+                (key, self.fingerprint, payload, len(payload), time.time()),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drops least recently used rows until the store fits max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM detections").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM detections ORDER BY last_access"
+        ).fetchall():
+            self._db.execute("DELETE FROM detections WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        return stats
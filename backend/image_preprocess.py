@@ -0,0 +1,55 @@
+import io
+import math
+from typing import Tuple
+from PIL import Image, ImageOps
+from .config import OCR_MAX_SIDE
+
+# CLIP ViT-B/32 resizes the shortest side to 224 before center-cropping
+CLIP_INPUT_SIDE = 224
+
+
+def decode_image(image_bytes: bytes, max_side: int) -> Image.Image:
+    """
+    Decodes an upload straight to (roughly) the resolution we need.
+
+    For JPEGs, draft mode lets libjpeg decode at 1/2, 1/4 or 1/8 scale, so a
+    12 MP phone photo never materializes at full size. Other formats are
+    decoded normally and downscaled once.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.format == "JPEG" and max(img.size) > max_side:
+        scale = max_side / max(img.size)
+        # draft() picks the smallest DCT scale that is still >= this size
+        img.draft("RGB", (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+
+    # Phone photos are usually stored sideways with an EXIF rotation tag
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.BICUBIC, reducing_gap=2.0)
+    return img
+
+
+def resize_shortest_side(img: Image.Image, side: int) -> Image.Image:
+    """Downscales so the shortest side equals `side` (never upscales)."""
+    short = min(img.size)
+    if short <= side:
+        return img
+    scale = side / short
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+
+def prepare_views(image_bytes: bytes, ocr_max_side: int = OCR_MAX_SIDE,
+                  clip_side: int = CLIP_INPUT_SIDE) -> Tuple[Image.Image, Image.Image]:
+    """
+    Decodes once and derives the two views the detectors consume:
+    an RGB image at CLIP's input resolution and a grayscale image capped at
+    `ocr_max_side` for Tesseract (which binarizes anyway, so one channel
+    is a third of the memory for the contrast pass).
+    """
+    base = decode_image(image_bytes, max(ocr_max_side, clip_side))
+    clip_view = resize_shortest_side(base, clip_side)
+    ocr_view = base.convert("L")
+    return clip_view, ocr_view
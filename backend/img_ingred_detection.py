@@ -1,7 +1,26 @@
-import io
+import glob
+import hashlib
+import json
 import logging
-from typing import List, Set
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
 from PIL import Image, ImageEnhance
+from .config import (
+    CLIP_MODEL, VOCAB_CACHE_DIR, VOCAB_FILE,
+    DETECT_WORKERS, VISUAL_TIMEOUT_S, OCR_TIMEOUT_S, OCR_MAX_SIDE,
+    DETECT_CACHE_SIZE, DETECT_CACHE_PATH, DETECT_CACHE_MAX_MB, DETECT_CACHE_PHASH,
+    DETECT_MODE, DETECT_TILE_GRID, DETECT_TILE_OVERLAP, DETECT_TILE_MERGE, DETECT_TILE_TOP_K
+)
+from .detection_cache import DetectionCache, content_hash, perceptual_hash
+from .image_preprocess import CLIP_INPUT_SIDE, prepare_views
+from .keyword_matcher import KeywordMatcher, build_matcher
+from .model_registry import registry, torch_module_bytes
+from . import telemetry
+from .vocab_matcher import VocabMatcher
 
 
 # Configure Logging
@@ -16,8 +35,10 @@ except ImportError:
     logger.warning("pytesseract not found. OCR disabled.")
 
 try:
-    from sentence_transformers import SentenceTransformer, util
+    import sentence_transformers
+    from sentence_transformers import SentenceTransformer
 except ImportError:
+    sentence_transformers = None
     SentenceTransformer = None
     logger.error("sentence-transformers not found.")
 
@@ -43,6 +64,29 @@ VOCAB_CATEGORIES = {
     ]
 }
 
+# Default CLIP similarity threshold, tunable per category below
+DEFAULT_THRESHOLD = 0.22
+CATEGORY_THRESHOLDS: Dict[str, float] = {}
+
+def _load_vocab_file(path: str):
+    """
+    Loads an external vocabulary (e.g. tens of thousands of ingredients and
+    brand items). Accepts either {category: [terms]} or
+    {"categories": {category: [terms]}, "thresholds": {category: float}}.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    if "categories" in data:
+        return data["categories"], data.get("thresholds", {})
+    return data, {}
+
+if VOCAB_FILE:
+    try:
+        VOCAB_CATEGORIES, CATEGORY_THRESHOLDS = _load_vocab_file(VOCAB_FILE)
+        logger.info(f"Loaded vocabulary file {VOCAB_FILE}")
+    except Exception as e:
+        logger.error(f"Vocab file load error, using built-in vocabulary: {e}")
+
 # Flatten vocab list for the model
 VOCAB = [item for sublist in VOCAB_CATEGORIES.values() for item in sublist]
 
@@ -57,46 +101,211 @@ SYNONYMS = {
     "eggs": "egg"
 }
 
-_clip_model = None
+# Default number of images per CLIP forward pass in batch mode
+BATCH_SIZE = 32
+
 _vocab_embeddings = None
+_vocab_matcher = None
+_ocr_matcher = None
+_executor = None
+_batch_executor = None
+_detection_cache = None
+_vocab_lock = threading.Lock()
+
+def _vocab_cache_path() -> str:
+    """Cache file name keyed by model, vocab contents and library version."""
+    key = hashlib.sha256()
+    key.update(CLIP_MODEL.encode("utf-8"))
+    key.update(sentence_transformers.__version__.encode("utf-8"))
+    key.update(np.dtype(np.float32).str.encode("utf-8"))
+    key.update("\n".join(VOCAB).encode("utf-8"))
+    return os.path.join(VOCAB_CACHE_DIR, f"clip_vocab_{key.hexdigest()[:16]}.npy")
+
+def _load_vocab_cache(path: str) -> Optional[np.ndarray]:
+    """Maps a cached embedding matrix read-only, or None if missing/stale."""
+    if not os.path.exists(path):
+        return None
+    try:
+        emb = np.load(path, mmap_mode="r")
+    except Exception as e:
+        logger.warning(f"Vocab cache unreadable, rebuilding: {e}")
+        return None
+    if emb.ndim != 2 or emb.shape[0] != len(VOCAB):
+        logger.warning("Vocab cache shape mismatch, rebuilding.")
+        return None
+    return emb
+
+def _save_vocab_cache(path: str, emb: np.ndarray):
+    """Writes atomically and drops caches left behind by older keys."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, emb)
+        os.replace(tmp, path)
+        for stale in glob.glob(os.path.join(os.path.dirname(path), "clip_vocab_*.npy")):
+            if stale != path:
+                os.remove(stale)
+    except OSError as e:
+        logger.warning(f"Could not persist vocab cache: {e}")
+
+def _load_clip():
+    if SentenceTransformer is None:
+        return None
+    logger.info("Loading CLIP model...")
+    return SentenceTransformer(CLIP_MODEL)
+
+registry.register("clip", _load_clip, size_fn=torch_module_bytes)
 
 def load_clip_model():
-    """Singleton loader for CLIP."""
-    global _clip_model, _vocab_embeddings
+    """Returns CLIP (loaded through the model registry) and the vocab embeddings."""
+    global _vocab_embeddings, _vocab_matcher
     
-    if _clip_model is None and SentenceTransformer is not None:
-        logger.info("Loading CLIP model...")
-        _clip_model = SentenceTransformer('clip-ViT-B-32')
-        _vocab_embeddings = _clip_model.encode(VOCAB, convert_to_tensor=True)
+    clip_model = registry.get("clip")
+    if clip_model is None:
+        return None, None
+
+    with _vocab_lock:
+        if _vocab_matcher is None:
+            # The memory-mapped cache skips the encode step on later starts and
+            # lets every worker process share the same page-cache pages.
+            path = _vocab_cache_path()
+            emb = _load_vocab_cache(path)
+            if emb is None:
+                logger.info(f"Encoding CLIP vocabulary ({len(VOCAB)} terms)...")
+                # Stored L2-normalized float32: cosine similarity is one BLAS
+                # matrix multiply straight off the shared mmap (NumPy has no
+                # float16 BLAS, so a float16 file would need a widened copy)
+                encoded = clip_model.encode(
+                    VOCAB, batch_size=256, convert_to_numpy=True, normalize_embeddings=True
+                ).astype(np.float32)
+                _save_vocab_cache(path, encoded)
+                # Re-open through the mmap so this process shares pages too;
+                # fall back to the in-memory copy if the cache dir is read-only
+                emb = _load_vocab_cache(path)
+                if emb is None:
+                    emb = encoded
+            _vocab_embeddings = emb
+            _vocab_matcher = VocabMatcher(
+                VOCAB_CATEGORIES, emb,
+                thresholds=CATEGORY_THRESHOLDS, default_threshold=DEFAULT_THRESHOLD
+            )
     
-    return _clip_model, _vocab_embeddings
+    return clip_model, _vocab_embeddings
 
-def visual_detect(image: Image.Image, threshold: float = 0.22) -> Set[str]:
+def _visual_detect_many(images: List[Image.Image], threshold: Optional[float] = None,
+                        batch_size: int = BATCH_SIZE, top_k: Optional[int] = None,
+                        categories: Optional[Iterable[str]] = None) -> List[Set[str]]:
+    """
+    Runs one batched CLIP forward pass per chunk of images and scores all of
+    them against the vocabulary with a single matrix multiply.
+    """
+    model, _ = load_clip_model()
+    if model is None: return [set() for _ in images]
+
+    results = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        image_emb = model.encode(
+            chunk, batch_size=len(chunk),
+            convert_to_numpy=True, normalize_embeddings=True
+        )
+        results.extend(_vocab_matcher.match(
+            image_emb, top_k=top_k, categories=categories, threshold=threshold
+        ))
+    return results
+
+def visual_detect(image: Image.Image, threshold: Optional[float] = None,
+                  top_k: Optional[int] = None,
+                  categories: Optional[Iterable[str]] = None) -> Set[str]:
     """
     Detects objects using CLIP with a lowered threshold for better sensitivity.
+
+    Uses the per-category thresholds unless `threshold` overrides them;
+    `categories` restricts scoring to those vocabulary groups.
     """
-    model, vocab_emb = load_clip_model()
-    if model is None: return set()
+    # Shares the batch code path so single and bulk results are identical
+    return _visual_detect_many(
+        [image], threshold=threshold, batch_size=1, top_k=top_k, categories=categories
+    )[0]
 
-    # Encode image
-    image_emb = model.encode(image, convert_to_tensor=True)
-    
-    # Calculate similarity
-    cosine_scores = util.cos_sim(image_emb, vocab_emb)[0]
+def parse_grid(grid: str) -> Tuple[int, int]:
+    """"3x2" -> (rows=3, cols=2)."""
+    rows, cols = (int(n) for n in grid.lower().split("x"))
+    return rows, cols
+
+def make_tiles(image: Image.Image, grid: Tuple[int, int] = (2, 2),
+               overlap: float = 0.25) -> List[Image.Image]:
+    """
+    Full frame followed by a rows x cols grid of crops, where neighbouring
+    crops share `overlap` of their width/height so items on a seam are
+    fully inside at least one tile.
+    """
+    rows, cols = grid
+    width, height = image.size
+    tile_w = width / (cols - (cols - 1) * overlap)
+    tile_h = height / (rows - (rows - 1) * overlap)
+    tiles = [image]
+    for r in range(rows):
+        for c in range(cols):
+            left = c * tile_w * (1 - overlap)
+            top = r * tile_h * (1 - overlap)
+            box = (round(left), round(top),
+                   min(width, round(left + tile_w)), min(height, round(top + tile_h)))
+            tiles.append(image.crop(box))
+    return tiles
+
+def visual_detect_tiled(image: Image.Image, grid: Tuple[int, int] = (2, 2),
+                        overlap: float = DETECT_TILE_OVERLAP, merge: str = DETECT_TILE_MERGE,
+                        top_k: int = DETECT_TILE_TOP_K,
+                        threshold: Optional[float] = None) -> Tuple[Set[str], Dict[str, Any]]:
+    """
+    Multi-crop detection for cluttered shelf photos, where one whole-image
+    embedding only picks up the dominant items.
 
-    found = set()
-    # Get top matches, not just threshold
-    # We use a loop to check threshold to allow multiple items
-    for idx, score in enumerate(cosine_scores):
-        if score > threshold:
-            item = VOCAB[idx]
-            found.add(item)
-            
-    return found
+    All tiles go through CLIP in a single batched forward pass. `merge="max"`
+    takes each term's best score across tiles before thresholding;
+    `merge="topk"` unions each tile's `top_k` hits. More tiles trade latency
+    for recall. Returns the items and a timing breakdown.
+    """
+    timings: Dict[str, Any] = {}
+    model, _ = load_clip_model()
+    if model is None: return set(), timings
+
+    start = time.perf_counter()
+    tiles = make_tiles(image, grid, overlap)
+    timings["crop"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tile_emb = model.encode(
+        tiles, batch_size=len(tiles), convert_to_numpy=True, normalize_embeddings=True
+    )
+    timings["encode"] = time.perf_counter() - start
+    timings["tiles"] = len(tiles)
+    # One batched pass, so per-tile cost is the amortized share
+    timings["per_tile"] = (timings["crop"] + timings["encode"]) / len(tiles)
+
+    start = time.perf_counter()
+    scores = _vocab_matcher.scores(tile_emb)
+    if merge == "topk":
+        found = set().union(*_vocab_matcher.match_scores(scores, top_k=top_k, threshold=threshold))
+    else:
+        found = _vocab_matcher.match_scores(scores.max(axis=0), threshold=threshold)[0]
+    timings["score"] = time.perf_counter() - start
+    return found, timings
+
+def _get_ocr_matcher() -> KeywordMatcher:
+    """Builds the OCR keyword automaton once per process."""
+    global _ocr_matcher
+    if _ocr_matcher is None:
+        _ocr_matcher = build_matcher(VOCAB, SYNONYMS)
+    return _ocr_matcher
 
-def ocr_detect(image: Image.Image) -> Set[str]:
+def ocr_detect(image: Image.Image, timeout: float = 0) -> Set[str]:
     """
     Detects text. Includes image preprocessing to read blurry labels better.
+    Expects the capped grayscale OCR view from prepare_views (any PIL image
+    works). A non-zero `timeout` (seconds) kills Tesseract when exceeded.
     """
     if pytesseract is None: return set()
     
@@ -106,44 +315,236 @@ def ocr_detect(image: Image.Image) -> Set[str]:
         enhanced_img = enhancer.enhance(1.8) # Increase contrast
         
         # Run OCR
-        text = pytesseract.image_to_string(enhanced_img).lower()
+        text = pytesseract.image_to_string(enhanced_img, timeout=timeout).lower()
         
-        # Simple keyword matching against our Vocab
-        found = set()
-        for v in VOCAB:
-            # Check if the vocab word is in the text (e.g., "barilla pasta" -> "pasta")
-            # We add spaces to avoid partial matches like "rice" in "price"
-            if f" {v} " in f" {text} " or v in text.split():
-                found.add(v)
-        return found
+        # Single pass over the text for every vocab term, plural and synonym
+        # (e.g., "barilla pasta" -> "pasta"), on word boundaries so "rice"
+        # is not matched inside "price"
+        return _get_ocr_matcher().find(text)
     except Exception as e:
         logger.warning(f"OCR Error: {e}")
         return set()
 
-def extract_ingredients(image_bytes: bytes) -> List[str]:
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared pool for decoding and the concurrent CLIP / OCR stages."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DETECT_WORKERS, thread_name_prefix="detect")
+    return _executor
+
+def _get_batch_executor() -> ThreadPoolExecutor:
     """
-    Combines Visual + OCR and normalizes results.
+    Pool for extract_ingredients_batch, kept apart from the interactive one
+    so a large gallery cannot eat into per-request stage deadlines.
     """
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=DETECT_WORKERS, thread_name_prefix="detect-batch")
+    return _batch_executor
+
+def _detection_fingerprint() -> str:
+    """Changes whenever a cached detection result could be stale."""
+    settings = {
+        "model": CLIP_MODEL,
+        "vocab": VOCAB,
+        "synonyms": SYNONYMS,
+        "default_threshold": DEFAULT_THRESHOLD,
+        "category_thresholds": CATEGORY_THRESHOLDS,
+        "clip_side": CLIP_INPUT_SIDE,
+        "ocr_max_side": OCR_MAX_SIDE,
+        "mode": DETECT_MODE,
+    }
+    if DETECT_MODE == "tiled":
+        settings["tiles"] = [DETECT_TILE_GRID, DETECT_TILE_OVERLAP, DETECT_TILE_MERGE, DETECT_TILE_TOP_K]
+    blob = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+def get_detection_cache() -> Optional[DetectionCache]:
+    """Lazily opens the result cache; None when caching is disabled."""
+    global _detection_cache
+    if _detection_cache is None and (DETECT_CACHE_SIZE > 0 or DETECT_CACHE_PATH):
+        _detection_cache = DetectionCache(
+            _detection_fingerprint(),
+            maxsize=DETECT_CACHE_SIZE,
+            path=DETECT_CACHE_PATH,
+            max_bytes=int(DETECT_CACHE_MAX_MB * 1024 * 1024),
+        )
+    return _detection_cache
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _load_views(image_bytes: bytes,
+                clip_side: int = CLIP_INPUT_SIDE) -> Optional[Tuple[Image.Image, Image.Image]]:
+    """(clip_view, ocr_view) for an upload, or None if it cannot be decoded."""
     try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        return prepare_views(image_bytes, clip_side=clip_side)
     except Exception as e:
         logger.error(f"Image load error: {e}")
-        return []
+        return None
 
-    detected = set()
-    
+def _normalize(detected: Set[str]) -> List[str]:
+    # Map synonyms (e.g., capsicum -> bell pepper)
+    final_list = [SYNONYMS.get(item, item) for item in detected]
+    # Return unique sorted list
+    return sorted(set(final_list))
+
+def extract_ingredients_detailed(image_bytes: bytes) -> Dict[str, Any]:
+    """
+    Runs visual and OCR detection concurrently, each under its own deadline.
+
+    Tesseract spends most of its time in a separate process, so the CLIP
+    pass overlaps it and latency is roughly the slower of the two stages.
+    A stage that misses its deadline contributes nothing and is flagged,
+    instead of blocking the request.
+
+    Results are cached by content hash, then by perceptual hash of the
+    decoded image, so re-uploads and re-encoded copies skip inference.
+    """
+    with telemetry.request_scope():
+        with telemetry.span("extract_ingredients") as span:
+            result = _extract_ingredients_detailed(image_bytes)
+            span.set(found=len(result["ingredients"]), cached=result["cached"])
+        for stage in ("decode", "visual", "ocr"):
+            if stage in result["timings"]:
+                telemetry.record_span(f"detect_{stage}", result["timings"][stage])
+            if result.get(f"{stage}_timed_out"):
+                telemetry.count("detect_timeouts_total", stage=stage)
+        if get_detection_cache() is not None:
+            telemetry.count("cache_requests_total", cache="detection",
+                            result="hit" if result["cached"] else "miss")
+    return result
+
+def _extract_ingredients_detailed(image_bytes: bytes) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result = {
+        "ingredients": [],
+        "visual_timed_out": False,
+        "ocr_timed_out": False,
+        "cached": False,
+        "timings": {},
+    }
+
+    cache = get_detection_cache()
+    digest = content_hash(image_bytes)
+    if cache is not None:
+        hit = cache.get("sha", digest)
+        if hit is not None:
+            return _cache_hit(result, hit, start)
+
+    # Tiled mode needs enough resolution for each crop to fill CLIP's input
+    tiled = DETECT_MODE == "tiled"
+    grid = parse_grid(DETECT_TILE_GRID) if tiled else (1, 1)
+    views, result["timings"]["decode"] = _timed(
+        _load_views, image_bytes, clip_side=CLIP_INPUT_SIDE * max(grid)
+    )
+    if views is None:
+        return result
+    clip_view, ocr_view = views
+
+    phash = None
+    if cache is not None and DETECT_CACHE_PHASH:
+        phash = perceptual_hash(clip_view)
+        hit = cache.get("phash", phash)
+        if hit is not None:
+            cache.put("sha", digest, hit)
+            return _cache_hit(result, hit, start)
+
+    pool = _get_executor()
     # 1. Visual Detection (Vegetables/Fruits)
-    detected.update(visual_detect(image))
-    
-    # 2. OCR Detection (Packaged Goods)
-    detected.update(ocr_detect(image))
+    if tiled:
+        visual_future = pool.submit(_timed, visual_detect_tiled, clip_view, grid)
+    else:
+        visual_future = pool.submit(_timed, visual_detect, clip_view)
+    # 2. OCR Detection (Packaged Goods); Tesseract gets a little grace past
+    # the budget so the process is reaped shortly after we stop waiting
+    ocr_future = pool.submit(_timed, ocr_detect, ocr_view, timeout=OCR_TIMEOUT_S + 1)
+    submitted = time.perf_counter()
+
+    detected = set()
+    failed = False
+    for stage, future, budget in (("visual", visual_future, VISUAL_TIMEOUT_S),
+                                  ("ocr", ocr_future, OCR_TIMEOUT_S)):
+        remaining = max(0.0, budget - (time.perf_counter() - submitted))
+        try:
+            found, elapsed = future.result(timeout=remaining)
+            if stage == "visual" and tiled:
+                found, result["timings"]["tiles"] = found
+            detected.update(found)
+            result["timings"][stage] = elapsed
+        except FutureTimeout:
+            logger.warning(f"{stage} detection exceeded its {budget}s budget")
+            result[f"{stage}_timed_out"] = True
+        except Exception as e:
+            logger.warning(f"{stage} detection failed: {e}")
+            failed = True
 
     # 3. Normalization
-    final_list = []
-    for item in detected:
-        # Map synonyms (e.g., capsicum -> bell pepper)
-        normalized = SYNONYMS.get(item, item)
-        final_list.append(normalized)
+    result["ingredients"] = _normalize(detected)
+    result["timings"]["total"] = time.perf_counter() - start
 
-    # Return unique sorted list
-    return sorted(list(set(final_list)))
\ No newline at end of file
+    # Partial results from a missed deadline or a failed stage are not worth
+    # remembering; the next upload retries the stage
+    if cache is not None and not (failed or result["visual_timed_out"] or result["ocr_timed_out"]):
+        entry = {"ingredients": result["ingredients"]}
+        cache.put("sha", digest, entry)
+        if phash is not None:
+            cache.put("phash", phash, entry)
+    return result
+
+def _cache_hit(result: Dict[str, Any], entry: Dict[str, Any], start: float) -> Dict[str, Any]:
+    result["ingredients"] = list(entry["ingredients"])
+    result["cached"] = True
+    result["timings"]["total"] = time.perf_counter() - start
+    return result
+
+def extract_ingredients(image_bytes: bytes) -> List[str]:
+    """
+    Combines Visual + OCR and normalizes results.
+    """
+    return extract_ingredients_detailed(image_bytes)["ingredients"]
+
+def extract_ingredients_batch(images: List[bytes], batch_size: int = BATCH_SIZE) -> List[List[str]]:
+    """
+    Bulk version of extract_ingredients for galleries and offline jobs.
+
+    Images are processed `batch_size` at a time, so memory does not grow
+    with the gallery. Each chunk is decoded in parallel (PIL releases the
+    GIL while decoding), CLIP runs one forward pass over it (per image in
+    tiled DETECT_MODE, over its tiles) and its Tesseract calls overlap that
+    pass. The work runs on a separate pool from interactive requests, and
+    each OCR call is held to OCR_TIMEOUT_S. Returns one ingredient list per
+    input, in input order; undecodable images yield an empty list.
+    """
+    if not images:
+        return []
+
+    # Same mode switch as extract_ingredients_detailed, so results match it
+    tiled = DETECT_MODE == "tiled"
+    grid = parse_grid(DETECT_TILE_GRID) if tiled else (1, 1)
+    clip_side = CLIP_INPUT_SIDE * max(grid)
+
+    pool = _get_batch_executor()
+    results: List[List[str]] = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        decoded = list(pool.map(lambda b: _load_views(b, clip_side=clip_side), chunk))
+        valid = [i for i, views in enumerate(decoded) if views is not None]
+
+        # Tesseract runs in a subprocess, so it overlaps the CLIP pass below
+        ocr_futures = [pool.submit(ocr_detect, decoded[i][1], timeout=OCR_TIMEOUT_S) for i in valid]
+        clip_views = [decoded[i][0] for i in valid]
+        if tiled:
+            # Each image's tiles already form one batched CLIP pass
+            visual = [visual_detect_tiled(view, grid)[0] for view in clip_views]
+        else:
+            visual = _visual_detect_many(clip_views, batch_size=batch_size)
+        ocr = [f.result() for f in ocr_futures]
+
+        chunk_results = [[] for _ in chunk]
+        for pos, i in enumerate(valid):
+            chunk_results[i] = _normalize(visual[pos] | ocr[pos])
+        results.extend(chunk_results)
+    return results
\ No newline at end of file
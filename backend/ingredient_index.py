@@ -0,0 +1,82 @@
+import threading
+from array import array
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+
+def normalize_term(term: str) -> str:
+    """Lowercase, collapse spaces and fold simple plurals ("tomatoes" -> "tomato")."""
+    term = " ".join(term.lower().split())
+    if term.endswith("ies") and len(term) > 4:
+        return term[:-3] + "y"
+    if term.endswith("oes") and len(term) > 4:
+        return term[:-2]
+    if term.endswith("s") and not term.endswith("ss") and len(term) > 3:
+        return term[:-1]
+    return term
+
+
+class IngredientIndex:
+    """
+    In-process inverted index: normalized ingredient -> sorted postings of
+    internal document numbers (compact uint32 arrays).
+
+    Documents are numbered in insertion order, so appending keeps every
+    postings list sorted. Overlap counting for a query is one np.unique over
+    the concatenated postings of its terms, so its cost follows the postings
+    touched rather than the corpus size.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._num: Dict[str, int] = {}
+        self._terms: List[Tuple[str, ...]] = []
+        self._postings: Dict[str, array] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, rid: str, ingredients: Iterable[str]):
+        terms = tuple(sorted({normalize_term(i) for i in ingredients if i.strip()}))
+        with self._lock:
+            num = self._num.get(rid)
+            if num is None:
+                num = len(self._ids)
+                self._num[rid] = num
+                self._ids.append(rid)
+                self._terms.append(())
+            old = self._terms[num]
+            if old == terms:
+                return
+            for term in old:
+                self._postings[term].remove(num)
+            for term in terms:
+                postings = self._postings.setdefault(term, array("I"))
+                if postings and postings[-1] > num:
+                    # Re-indexed older document: keep the list sorted
+                    pos = int(np.searchsorted(np.frombuffer(postings, dtype=np.uint32), num))
+                    postings.insert(pos, num)
+                else:
+                    postings.append(num)
+            self._terms[num] = terms
+
+    def overlap(self, rid: str, ingredients: Iterable[str]) -> int:
+        num = self._num.get(rid)
+        if num is None:
+            return 0
+        query = {normalize_term(i) for i in ingredients}
+        return len(query.intersection(self._terms[num]))
+
+    def candidates(self, ingredients: Iterable[str], limit: int) -> List[Tuple[str, int]]:
+        """Up to `limit` (id, overlap) pairs sharing ingredients, best first."""
+        with self._lock:
+            lists = [self._postings[t] for t in {normalize_term(i) for i in ingredients}
+                     if self._postings.get(t)]
+            if not lists:
+                return []
+            docs = np.concatenate([np.frombuffer(p, dtype=np.uint32) for p in lists])
+            hits, counts = np.unique(docs, return_counts=True)
+            # Most shared ingredients first, ties in document order
+            order = np.lexsort((hits, -counts))[:limit]
+            return [(self._ids[n], int(c)) for n, c in zip(hits[order], counts[order])]
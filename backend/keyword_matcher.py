@@ -0,0 +1,105 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def plural_forms(term: str) -> List[str]:
+    """
+    Simple English plurals of the last word ("tomato" -> "tomatoes",
+    "green chili" -> "green chilies").
+    """
+    word = term.rpartition(" ")[2]
+    if not word or word.endswith("s"):
+        return []
+    stem = term[:len(term) - len(word)]
+    if word.endswith(("x", "z", "ch", "sh")):
+        return [term + "es"]
+    if word.endswith("y") and len(word) > 1 and word[-2] not in "aeiou":
+        return [stem + word[:-1] + "ies"]
+    if word.endswith("i") and len(word) > 1:
+        return [stem + word[:-1] + "ies", term + "s"]
+    if word.endswith("o"):
+        return [term + "es", term + "s"]
+    return [term + "s"]
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton mapping surface forms to canonical terms.
+
+    All patterns are found in a single pass over the text, independent of
+    how many there are. Matches must sit on word boundaries, so "rice" is
+    not reported inside "price". Whitespace in the text is collapsed before
+    matching so multi-word terms survive OCR line breaks.
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+
+        for surface, canonical in patterns.items():
+            self._insert(" ".join(surface.lower().split()), canonical)
+        self._build_failure_links()
+
+    def _insert(self, surface: str, canonical: str):
+        if not surface:
+            return
+        state = 0
+        for ch in surface:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(surface), canonical))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # Inherit matches that end here via the failure chain
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Set[str]:
+        """Canonical terms of every pattern occurring in `text`."""
+        text = " ".join(text.lower().split())
+        goto, fail, out = self._goto, self._fail, self._out
+        last = len(text) - 1
+        found = set()
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            if i < last and text[i + 1].isalnum():
+                continue
+            for length, canonical in out[state]:
+                start = i - length + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    found.add(canonical)
+        return found
+
+
+def build_matcher(vocab: Iterable[str], synonyms: Dict[str, str]) -> KeywordMatcher:
+    """Matcher over vocab terms, their plurals and synonym keys."""
+    patterns: Dict[str, str] = {}
+    for term in vocab:
+        for form in plural_forms(term):
+            patterns.setdefault(form, term)
+    for alias, canonical in synonyms.items():
+        patterns[alias] = canonical
+    # Exact vocab terms take precedence over generated forms
+    for term in vocab:
+        patterns[term] = term
+    return KeywordMatcher(patterns)
@@ -1,53 +1,270 @@
 import os
+import functools
+import hashlib
 import logging
-import multiprocessing
-from .config import MODEL_PATH
+import time
+import weakref
+from typing import Any, Dict, Iterator, List, Optional
+from .config import (MODEL_PATH, PREFIX_CACHE, LLM_WORKERS, LLM_QUEUE_SIZE,
+                     LLM_REQUEST_TIMEOUT_S, LLM_DRAFT, LLM_DRAFT_TOKENS, LLM_N_CTX)
+from .llm_scheduler import GenerationScheduler
+from . import telemetry
+from .model_registry import ModelUnavailable, registry
 
 logger = logging.getLogger(__name__)
-_llm_instance = None
 
-def load_llm():
-    """Loads the GGUF model with optimal CPU settings."""
-    global _llm_instance
-    if _llm_instance is not None:
-        return _llm_instance
+# Static prompt prefixes whose evaluated state is snapshotted per model
+_prompt_prefixes: List[str] = []
+# Llama instance -> {formatted prefix: (prefix tokens, LlamaState)}
+_prefix_states = weakref.WeakKeyDictionary()
+# Llama instance -> its draft model, so speculation can be switched per call
+_draft_models = weakref.WeakKeyDictionary()
+# Request queue in front of the model instances (created on first use)
+_scheduler = None
 
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Please upload model.gguf.")
+def _make_draft_model():
+    if LLM_DRAFT == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        # Proposes the continuation of the latest n-gram seen earlier in the context
+        return LlamaPromptLookupDecoding(num_pred_tokens=LLM_DRAFT_TOKENS)
+    if LLM_DRAFT != "none":
+        logger.warning(f"Unknown LLM_DRAFT '{LLM_DRAFT}', speculative decoding disabled")
+    return None
 
-    try:
-        from llama_cpp import Llama
-        
-        # CPU Optimization
-        cores = multiprocessing.cpu_count()
-        
-        logger.info(f"Loading Llama model on {cores} threads...")
-        _llm_instance = Llama(
+def _load_llama():
+    from llama_cpp import Llama
+    
+    # CPU Optimization: split the cores between the worker instances
+    cores = os.cpu_count() or 1
+    threads = max(1, cores // LLM_WORKERS)
+    
+    logger.info(f"Loading {LLM_WORKERS} Llama instance(s) on {threads} threads each...")
+    # Every instance maps the same weights; only the KV cache is per instance
+    pool = []
+    for _ in range(LLM_WORKERS):
+        draft = _make_draft_model()
+        llm = Llama(
             model_path=MODEL_PATH,
-            n_ctx=2048,      # Context window
-            n_gpu_layers=0,  # Force CPU
-            n_threads=cores, # Maximize CPU usage
+            n_ctx=LLM_N_CTX,   # Context window
+            n_gpu_layers=0,    # Force CPU
+            n_threads=threads,
+            draft_model=draft, # Verifying drafts needs logits for every position
             verbose=False
         )
-        return _llm_instance
+        if draft is not None:
+            _draft_models[llm] = draft
+        pool.append(llm)
+    return pool
+
+# Weights are memory-mapped, so the GGUF file size approximates residency,
+# and it is known before the first load
+registry.register("llm", _load_llama, size_fn=lambda _: os.path.getsize(MODEL_PATH),
+                  size_hint=lambda: os.path.getsize(MODEL_PATH))
+
+def load_llm_pool():
+    """Loads the LLM_WORKERS model instances, None if loading failed."""
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Please upload model.gguf.")
+
+    try:
+        return registry.get("llm")
+    except ModelUnavailable:
+        # Already logged when the load failed
+        return None
     except Exception as e:
         logger.error(f"LLM Load Failed: {e}")
         return None
 
-def generate_text(prompt: str, max_tokens: int = 1024) -> str:
-    llm = load_llm()
-    if not llm:
-        return "System Error: Model could not be loaded."
+def load_llm():
+    """Loads the GGUF model with optimal CPU settings (the first instance)."""
+    pool = load_llm_pool()
+    return pool[0] if pool else None
+
+def count_tokens(text: str) -> int:
+    """
+    Token count with the loaded model's tokenizer, as create_completion
+    would see `text` (BOS included). Falls back to ~4 characters per token
+    when the model is unavailable.
+    """
+    try:
+        llm = load_llm()
+    except FileNotFoundError:
+        llm = None
+    if llm is None:
+        return (len(text) + 3) // 4 + 1
+    return len(llm.tokenize(text.encode("utf-8"), add_bos=True, special=True))
+
+def context_size() -> int:
+    llm = load_llm() if os.path.exists(MODEL_PATH) else None
+    return llm.n_ctx() if llm is not None else LLM_N_CTX
+
+# Sampling settings shared by the blocking and streaming paths
+SAMPLING_PARAMS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "stop": ["[INST]", "User:"],
+}
 
+@functools.lru_cache(maxsize=4)
+def _file_fingerprint(path: str, size: int, mtime: float) -> str:
+    h = hashlib.sha256(f"{size}:{mtime}".encode())
+    chunk = 1 << 20
+    with open(path, "rb") as fh:
+        h.update(fh.read(chunk))
+        if size > chunk:
+            fh.seek(max(chunk, size - chunk))
+            h.update(fh.read(chunk))
+    return h.hexdigest()
+
+def model_fingerprint() -> str:
+    """
+    Cheap identity of the GGUF file (size, mtime, first and last MiB), so
+    caches of generated text are invalidated when the model is swapped.
+    """
+    try:
+        st = os.stat(MODEL_PATH)
+    except OSError:
+        return "missing"
+    return _file_fingerprint(MODEL_PATH, st.st_size, st.st_mtime)
+
+def format_prompt(prompt: str) -> str:
     # Mistral/Llama Instruction Format
-    formatted = f"[INST] {prompt} [/INST]"
-    
-    output = llm.create_completion(
+    return f"[INST] {prompt} [/INST]"
+
+def register_prompt_prefix(prefix: str):
+    """
+    Declares an invariant prompt prefix. The first request that starts with
+    it evaluates the prefix once and snapshots the llama.cpp state; later
+    requests restore that snapshot so only their suffix is prefilled.
+    """
+    if prefix not in _prompt_prefixes:
+        _prompt_prefixes.append(prefix)
+
+def _prefix_state(llm, formatted_prefix: str):
+    states = _prefix_states.setdefault(llm, {})
+    telemetry.count("cache_requests_total", cache="prefix",
+                    result="hit" if formatted_prefix in states else "miss")
+    if formatted_prefix not in states:
+        start = time.perf_counter()
+        # Tokenized the same way create_completion tokenizes full prompts
+        tokens = llm.tokenize(formatted_prefix.encode("utf-8"), add_bos=True, special=True)
+        llm.reset()
+        llm.eval(tokens)
+        states[formatted_prefix] = (tokens, llm.save_state())
+        logger.info(f"Cached prompt prefix: {len(tokens)} tokens evaluated "
+                    f"in {time.perf_counter() - start:.2f}s")
+    return states[formatted_prefix]
+
+def _prepare_context(llm, formatted: str, use_prefix_cache: bool):
+    """
+    Puts the model's KV cache into the best starting state for `formatted`.
+
+    create_completion already skips re-evaluating tokens that match what is
+    in the cache, so restoring the prefix snapshot leaves only the suffix to
+    prefill. Without the prefix cache the context is reset, forcing a full
+    prefill (the baseline for benchmarks).
+    """
+    if not use_prefix_cache:
+        llm.reset()
+        return
+    for prefix in _prompt_prefixes:
+        formatted_prefix = f"[INST] {prefix}"
+        if not formatted.startswith(formatted_prefix):
+            continue
+        tokens, state = _prefix_state(llm, formatted_prefix)
+        # Already there, e.g. the previous request used the same prefix
+        if list(llm.input_ids[:len(tokens)]) != tokens:
+            llm.load_state(state)
+        return
+
+@functools.lru_cache(maxsize=16)
+def _json_grammar(worker: int, json_schema: str):
+    # Compiled once per worker: grammar objects are not shared between threads
+    from llama_cpp import LlamaGrammar
+    return LlamaGrammar.from_json_schema(json_schema, verbose=False)
+
+def _run_completion(worker: int, prompt: str, max_tokens: int, use_prefix_cache: bool,
+                    json_schema: Optional[str] = None,
+                    speculative: Optional[bool] = None) -> Iterator[str]:
+    """Scheduler worker body: streams one completion on the worker's own instance."""
+    pool = load_llm_pool()
+    if not pool:
+        yield "System Error: Model could not be loaded."
+        return
+    llm = pool[worker % len(pool)]
+    # Only instances loaded with LLM_DRAFT have a draft model to switch on
+    llm.draft_model = _draft_models.get(llm) if speculative is not False else None
+
+    extra = {}
+    if json_schema:
+        extra["grammar"] = _json_grammar(worker, json_schema)
+
+    formatted = format_prompt(prompt)
+    start = time.perf_counter()
+    _prepare_context(llm, formatted, use_prefix_cache)
+    first, parts = None, []
+    for chunk in llm.create_completion(
         prompt=formatted,
         max_tokens=max_tokens,
-        temperature=0.7,
-        top_p=0.9,
-        stop=["[INST]", "User:"],
-        echo=False
-    )
-    return output['choices'][0]['text'].strip()
\ No newline at end of file
+        echo=False,
+        stream=True,
+        **SAMPLING_PARAMS,
+        **extra
+    ):
+        if first is None:
+            # Prefill ends when the first token comes out
+            first = time.perf_counter()
+            telemetry.record_span("llm_prefill", first - start, worker=worker)
+        text = chunk['choices'][0]['text']
+        if text:
+            parts.append(text)
+            yield text
+    if first is not None:
+        # Chunks are not tokens (speculative decoding emits several per
+        # chunk), so count the tokens of the generated text
+        tokens = len(llm.tokenize("".join(parts).encode("utf-8"), add_bos=False, special=True))
+        telemetry.record_span("llm_decode", time.perf_counter() - first, tokens=tokens)
+        telemetry.count("llm_completion_tokens_total", tokens)
+
+def get_scheduler() -> GenerationScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = GenerationScheduler(
+            _run_completion,
+            workers=LLM_WORKERS,
+            queue_size=LLM_QUEUE_SIZE,
+            timeout_s=LLM_REQUEST_TIMEOUT_S,
+        )
+    return _scheduler
+
+def scheduler_stats() -> Dict[str, Any]:
+    """Queue depth, active requests, wait times and outcome counts."""
+    return get_scheduler().stats()
+
+def generate_text(prompt: str, max_tokens: int = 1024,
+                  use_prefix_cache: bool = PREFIX_CACHE,
+                  json_schema: Optional[str] = None,
+                  speculative: Optional[bool] = None) -> str:
+    """
+    Blocking generation through the request scheduler. Raises SchedulerBusy
+    when the queue is full and GenerationTimeout past LLM_REQUEST_TIMEOUT_S.
+    With `json_schema` (a JSON string) the output is grammar-constrained to
+    a document matching it. `speculative=False` turns off LLM_DRAFT
+    speculative decoding for this call.
+    """
+    with telemetry.request_scope(), telemetry.span("generate_text"):
+        text = get_scheduler().generate(prompt, max_tokens=max_tokens,
+                                        use_prefix_cache=use_prefix_cache,
+                                        json_schema=json_schema,
+                                        speculative=speculative)
+    return text.strip()
+
+def generate_text_stream(prompt: str, max_tokens: int = 1024,
+                         use_prefix_cache: bool = PREFIX_CACHE,
+                         json_schema: Optional[str] = None,
+                         speculative: Optional[bool] = None) -> Iterator[str]:
+    """Yields text pieces as llama.cpp produces them; closing it cancels the request."""
+    return get_scheduler().stream(prompt, max_tokens=max_tokens,
+                                  use_prefix_cache=use_prefix_cache,
+                                  json_schema=json_schema,
+                                  speculative=speculative)
\ No newline at end of file
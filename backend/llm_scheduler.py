@@ -0,0 +1,157 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a job's output queue
+_DONE = object()
+
+
+class SchedulerBusy(RuntimeError):
+    """The request queue is full; the caller should retry later."""
+
+
+class GenerationTimeout(TimeoutError):
+    """The request did not finish within its deadline."""
+
+
+class _Job:
+    def __init__(self, prompt: str, kwargs: Dict[str, Any], timeout_s: float):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.enqueued = time.monotonic()
+        self.deadline = self.enqueued + timeout_s if timeout_s > 0 else None
+        self.cancelled = threading.Event()
+        self.timed_out = False
+        # Carries the caller's request id into the worker thread
+        self.context = contextvars.copy_context()
+        self.out: "queue.Queue[Any]" = queue.Queue()
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+
+class GenerationScheduler:
+    """
+    Runs LLM requests on `workers` threads behind a bounded FIFO queue.
+
+    Each worker owns one model instance (`run(worker, prompt, **kwargs)`
+    yields text pieces), so requests never share a KV cache and cores can be
+    split between instances. When `queue_size` requests are already waiting
+    submit() raises SchedulerBusy instead of queueing without bound.
+    Requests past their deadline, or whose consumer went away, are cancelled
+    between tokens.
+    """
+
+    def __init__(self, run: Callable[..., Iterator[str]], workers: int = 1,
+                 queue_size: int = 8, timeout_s: float = 300):
+        self.run = run
+        self.workers = max(1, workers)
+        self.timeout_s = timeout_s
+        self._queue: "queue.Queue[_Job]" = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waits = deque(maxlen=256)
+        self._counts = {"completed": 0, "rejected": 0, "timeouts": 0, "cancelled": 0, "errors": 0}
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, args=(i,), name=f"llm-worker-{i}", daemon=True).start()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _worker(self, index: int):
+        while True:
+            job = self._queue.get()
+            if job.cancelled.is_set() or job.expired():
+                job.timed_out = job.expired()
+                self._count("timeouts" if job.timed_out else "cancelled")
+                job.out.put(_DONE)
+                continue
+            job.context.run(self._process, index, job)
+
+    def _process(self, index: int, job: _Job):
+        wait = time.monotonic() - job.enqueued
+        with self._lock:
+            self._active += 1
+            self._waits.append(wait)
+        telemetry.record_span("llm_queue_wait", wait, worker=index)
+        pieces = self.run(index, job.prompt, **job.kwargs)
+        try:
+            status = "completed"
+            for piece in pieces:
+                if job.expired():
+                    job.timed_out = True
+                    status = "timeouts"
+                    break
+                if job.cancelled.is_set():
+                    status = "cancelled"
+                    break
+                job.out.put(piece)
+            self._count(status)
+            telemetry.count("llm_requests_total", status=status)
+        except Exception as e:
+            logger.error(f"Generation failed on worker {index}: {e}")
+            self._count("errors")
+            telemetry.count("llm_requests_total", status="errors")
+            job.out.put(e)
+        finally:
+            # Stops the model mid-generation when we broke out early
+            pieces.close()
+            with self._lock:
+                self._active -= 1
+            job.out.put(_DONE)
+
+    def submit(self, prompt: str, **kwargs) -> _Job:
+        job = _Job(prompt, kwargs, self.timeout_s)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._count("rejected")
+            telemetry.count("llm_rejected_total")
+            raise SchedulerBusy(f"{self._queue.qsize()} requests already waiting")
+        return job
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yields the text pieces of one request; closing the generator cancels it."""
+        job = self.submit(prompt, **kwargs)
+        try:
+            while True:
+                remaining = None if job.deadline is None else job.deadline - time.monotonic()
+                try:
+                    item = job.out.get(timeout=max(0.0, remaining) if remaining is not None else None)
+                except queue.Empty:
+                    raise GenerationTimeout(f"Generation exceeded {self.timeout_s:g}s")
+                if item is _DONE:
+                    if job.timed_out:
+                        raise GenerationTimeout(f"Generation exceeded {self.timeout_s:g}s")
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            job.cancelled.set()
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return "".join(self.stream(prompt, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            out: Dict[str, Any] = {
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "active": self._active,
+                **self._counts,
+            }
+        if waits:
+            out["wait_p50_s"] = waits[len(waits) // 2]
+            out["wait_p95_s"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            out["wait_max_s"] = waits[-1]
+        return out
\ No newline at end of file
@@ -0,0 +1,207 @@
+import gc
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from .config import MODEL_LOAD_RETRY_S, MODEL_MEMORY_BUDGET_MB, MODEL_WARMUP
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (Linux), 0 where unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def torch_module_bytes(model: Any) -> int:
+    """Parameter + buffer bytes of a torch module (e.g. a SentenceTransformer)."""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelUnavailable(RuntimeError):
+    """A recent load of the model failed; raised until it may be retried."""
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any], size_fn: Optional[Callable[[Any], int]],
+                 size_hint: Optional[Callable[[], int]]):
+        self.loader = loader
+        self.size_fn = size_fn
+        self.size_hint = size_hint
+        self.model = None
+        self.bytes = 0
+        self.load_seconds: Optional[float] = None
+        self.loads = 0
+        self.last_used = 0.0
+        # Last failed load: when, and the error (None if the loader returned None)
+        self.failed_at: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Central owner of the large models (CLIP, MiniLM, the GGUF LLM).
+
+    Models load lazily on first get(). Each load records its time and an
+    approximate resident size (from `size_fn`, else the RSS growth during
+    the load). When the total would exceed the budget, least recently used
+    models are dropped; they reload transparently on their next get().
+    A failed load is not retried for `retry_s`; get() fails fast meanwhile.
+    """
+
+    def __init__(self, budget_bytes: int = 0, retry_s: float = 60.0):
+        self.budget_bytes = budget_bytes
+        self.retry_s = retry_s
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 size_fn: Optional[Callable[[Any], int]] = None,
+                 size_hint: Optional[Callable[[], int]] = None, replace: bool = False):
+        """
+        Adds a model; `replace` swaps the loader of an existing one (e.g. for
+        stubs). `size_hint` estimates the size before the first load, so the
+        budget can make room for it up front.
+        """
+        with self._lock:
+            if name not in self._entries or replace:
+                self._entries[name] = _Entry(loader, size_fn, size_hint)
+
+    def get(self, name: str) -> Any:
+        entry = self._entries[name]
+        with entry.lock:
+            if entry.model is None:
+                if entry.failed_at is not None and time.monotonic() - entry.failed_at < self.retry_s:
+                    if entry.error is not None:
+                        raise ModelUnavailable(f"Model '{name}' failed to load: {entry.error}")
+                    return None
+                # A previous load tells us roughly how much room to make
+                self._make_room(entry.bytes or self._hint(entry), keep=name)
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                try:
+                    model = entry.loader()
+                except Exception as e:
+                    entry.failed_at, entry.error = time.monotonic(), e
+                    raise
+                entry.load_seconds = time.perf_counter() - start
+                if model is None:
+                    entry.failed_at, entry.error = time.monotonic(), None
+                    return None
+                entry.failed_at = entry.error = None
+                entry.model = model
+                entry.loads += 1
+                entry.bytes = self._measure(entry, rss_before)
+                telemetry.record_span("model_load", entry.load_seconds, model=name)
+                telemetry.count("model_loads_total", model=name)
+                logger.info(f"Loaded model '{name}' in {entry.load_seconds:.1f}s "
+                            f"(~{entry.bytes / 2**20:.0f} MB)")
+            entry.last_used = time.monotonic()
+            model = entry.model
+        self._make_room(0, keep=name)
+        return model
+
+    def _measure(self, entry: _Entry, rss_before: int) -> int:
+        if entry.size_fn is not None:
+            try:
+                return int(entry.size_fn(entry.model))
+            except Exception as e:
+                logger.warning(f"Model size estimate failed: {e}")
+        return max(0, _rss_bytes() - rss_before)
+
+    def _hint(self, entry: _Entry) -> int:
+        if entry.size_hint is None:
+            return 0
+        try:
+            return int(entry.size_hint())
+        except Exception as e:
+            logger.warning(f"Model size hint failed: {e}")
+            return 0
+
+    def _resident_bytes(self) -> int:
+        return sum(e.bytes for e in self._entries.values() if e.model is not None)
+
+    def _make_room(self, incoming: int, keep: str):
+        """Evicts LRU models (other than `keep`) until `incoming` more bytes fit."""
+        if self.budget_bytes <= 0:
+            return
+        evicted = False
+        with self._lock:
+            loaded = sorted(
+                (e.last_used, n) for n, e in self._entries.items()
+                if e.model is not None and n != keep
+            )
+            for _, victim in loaded:
+                if self._resident_bytes() + incoming <= self.budget_bytes:
+                    break
+                logger.info(f"Model memory budget exceeded, evicting '{victim}'")
+                self._entries[victim].model = None
+                evicted = True
+        if evicted:
+            gc.collect()
+
+    def evict(self, name: str):
+        entry = self._entries.get(name)
+        if entry is not None and entry.model is not None:
+            with entry.lock:
+                entry.model = None
+            gc.collect()
+
+    def warmup(self, names: Iterable[str]):
+        """Loads the given models now (e.g. at boot) instead of on first use."""
+        for name in names:
+            if name not in self._entries:
+                logger.warning(f"Unknown model '{name}' in warmup list")
+                continue
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Warmup of '{name}' failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        models = {
+            name: {
+                "loaded": e.model is not None,
+                "bytes": e.bytes,
+                "load_seconds": e.load_seconds,
+                "loads": e.loads,
+                "load_error": str(e.error) if e.failed_at is not None else None,
+            }
+            for name, e in self._entries.items()
+        }
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": self._resident_bytes(),
+            "models": models,
+        }
+
+
+registry = ModelRegistry(budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024),
+                         retry_s=MODEL_LOAD_RETRY_S)
+
+# Modules that register each model when imported
+_PROVIDERS = {
+    "clip": ".img_ingred_detection",
+    "minilm": ".rag_pipeline",
+    "llm": ".llm",
+}
+
+
+def warmup_models(names: Optional[Iterable[str]] = None):
+    """Boot-time warmup of MODEL_WARMUP (or `names`)."""
+    names = list(MODEL_WARMUP if names is None else names)
+    for name in names:
+        if name in _PROVIDERS:
+            importlib.import_module(_PROVIDERS[name], __package__)
+    registry.warmup(names)
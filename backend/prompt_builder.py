@@ -0,0 +1,102 @@
+import logging
+from typing import Any, Callable, Dict, List
+from .config import (PROMPT_INGREDIENT_TOKENS, PROMPT_PREFS_TOKENS, PROMPT_CONTEXT_TOKENS,
+                     MIN_COMPLETION_TOKENS, RAG_SNIPPET_CHARS)
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT = "No prior recipes found."
+
+
+def _fit_words(text: str, budget: int, count_tokens: Callable[[str], int]) -> str:
+    """Longest word prefix of `text` within `budget` tokens."""
+    if count_tokens(text) <= budget:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+
+def _fit_items(items: List[str], budget: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Leading items whose ", "-joined text fits `budget` tokens."""
+    kept: List[str] = []
+    for item in items:
+        if count_tokens(", ".join(kept + [item])) > budget:
+            break
+        kept.append(item)
+    return kept
+
+
+def context_entry(recipe: Dict[str, Any], snippet_chars: int = RAG_SNIPPET_CHARS) -> str:
+    entry = f"- {recipe['title']} (Ingredients: {recipe['ingredients']})\n"
+    # Recipe text gives prompt-lookup decoding phrasing to draft from
+    if snippet_chars > 0 and recipe.get("recipe_text"):
+        entry += f"  {' '.join(recipe['recipe_text'][:snippet_chars].split())}\n"
+    return entry
+
+
+def build_prompt(template: str, ingredients: List[str], prefs: str, recipes: List[Dict[str, Any]],
+                 count_tokens: Callable[[str], int], n_ctx: int, max_tokens: int,
+                 wrap: Callable[[str], str] = lambda p: p) -> Dict[str, Any]:
+    """
+    Fills `template` within the model's context window.
+
+    Ingredients, preferences and RAG context each get a token budget.
+    Context entries are added best match first (the order of `recipes`);
+    an entry that does not fit is retried without its text snippet, then
+    dropped. Room for at least MIN_COMPLETION_TOKENS is kept, and
+    `max_tokens` is lowered to what is left after the prompt. `wrap` is the
+    chat formatting applied before tokenization.
+
+    Returns the prompt, the completion budget, per-section token counts and
+    the recipes that made it into the context.
+    """
+    # Instructions and scaffolding are fixed; everything else is budgeted
+    instructions = count_tokens(wrap(template.format(ingredients="", prefs="", context="")))
+
+    kept = _fit_items(ingredients, PROMPT_INGREDIENT_TOKENS, count_tokens)
+    if len(kept) < len(ingredients):
+        logger.warning(f"Prompt keeps {len(kept)} of {len(ingredients)} ingredients (token budget)")
+    ingredients_str = ", ".join(kept)
+    prefs_str = _fit_words(prefs, PROMPT_PREFS_TOKENS, count_tokens) if prefs else "None"
+
+    sections = {
+        "instructions": instructions,
+        "ingredients": count_tokens(ingredients_str),
+        "prefs": count_tokens(prefs_str),
+    }
+    room = n_ctx - sum(sections.values()) - MIN_COMPLETION_TOKENS
+    context_budget = max(0, min(PROMPT_CONTEXT_TOKENS, room))
+
+    context_str, used = "", []
+    for recipe in recipes:
+        for entry in (context_entry(recipe), context_entry(recipe, snippet_chars=0)):
+            if count_tokens(context_str + entry) <= context_budget:
+                context_str += entry
+                used.append(recipe)
+                break
+    sections["context"] = count_tokens(context_str) if context_str else 0
+
+    prompt = template.format(
+        ingredients=ingredients_str,
+        prefs=prefs_str,
+        context=context_str if context_str else NO_CONTEXT,
+    )
+    prompt_tokens = count_tokens(wrap(prompt))
+    completion_budget = max(0, min(max_tokens, n_ctx - prompt_tokens))
+    if completion_budget < MIN_COMPLETION_TOKENS:
+        logger.warning(f"Only {completion_budget} tokens left for the recipe "
+                       f"({prompt_tokens} prompt tokens, n_ctx {n_ctx})")
+    return {
+        "prompt": prompt,
+        "max_tokens": completion_budget,
+        "prompt_tokens": prompt_tokens,
+        "sections": sections,
+        "recipes": used,
+    }
\ No newline at end of file
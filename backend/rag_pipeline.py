@@ -1,65 +1,366 @@
-from typing import List, Dict
-import chromadb
+import logging
+import threading
+from typing import Any, List, Dict, Optional, Sequence, Tuple
+import numpy as np
 from sentence_transformers import SentenceTransformer
-from .config import CHROMA_DIR, EMBED_MODEL, COLLECTION_NAME
+from .cache import LRUCache
+from .config import (
+    CHROMA_DIR, EMBED_MODEL, COLLECTION_NAME, QUERY_CACHE_SIZE, RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_MODE, HYBRID_CANDIDATES, VECTOR_BACKEND, VECTOR_STORE_DIR, VECTOR_STORE_DTYPE
+)
+from .ingredient_index import IngredientIndex
+from .model_registry import registry, torch_module_bytes
+from . import telemetry
+from .vector_store import ChromaStore, NumpyStore, VectorStore
 
-_embedding_model = None
-_client = None
-_collection = None
+logger = logging.getLogger(__name__)
+
+_store = None
+_index = None
+# Store generation the index reflects
+_index_generation = None
+# Set while a background rebuild runs: the generation it will reflect, and
+# the in-process writes to replay onto it before it is swapped in
+_rebuild_generation = None
+_rebuild_writes: Optional[List[Tuple[str, List[str]]]] = None
+# Guards the index state above; never held for a rebuild
+_index_lock = threading.Lock()
+
+# L1: normalized ingredient set -> query vector
+_query_vectors = LRUCache(QUERY_CACHE_SIZE)
+# L2: (ingredient set, top_k, store generation) -> results. The generation
+# comes from the store itself, so writes by other processes (a seed run,
+# another API worker) also make old entries unreachable
+_retrievals = LRUCache(RETRIEVAL_CACHE_SIZE)
+
+def _get_store() -> VectorStore:
+    """Lazy loader for the configured vector store."""
+    global _store
+    if _store is None:
+        if VECTOR_BACKEND == "numpy":
+            _store = NumpyStore(VECTOR_STORE_DIR, dtype=VECTOR_STORE_DTYPE)
+        else:
+            _store = ChromaStore(CHROMA_DIR, COLLECTION_NAME)
+    return _store
+
+registry.register("minilm", lambda: SentenceTransformer(EMBED_MODEL), size_fn=torch_module_bytes)
 
 def _get_resources():
     """Lazy loader for Database resources."""
-    global _embedding_model, _client, _collection
-    
-    if _embedding_model is None:
-        _embedding_model = SentenceTransformer(EMBED_MODEL)
-    
-    if _client is None:
-        # PersistentClient ensures data is saved to disk
-        _client = chromadb.PersistentClient(path=CHROMA_DIR)
-    
-    if _collection is None:
-        _collection = _client.get_or_create_collection(name=COLLECTION_NAME)
-            
-    return _embedding_model, _collection
+    return registry.get("minilm"), _get_store()
+
+def _split_ingredients(meta_value: str) -> List[str]:
+    return [i.strip() for i in meta_value.split(",") if i.strip()]
+
+def _get_index() -> IngredientIndex:
+    """
+    The ingredient inverted index. Built from the collection on first use;
+    writes from this process update it in place. When another process has
+    written to the store, the index is rebuilt in the background and the
+    current one is served until the new one is ready.
+    """
+    global _index, _index_generation, _rebuild_generation, _rebuild_writes
+    with _index_lock:
+        if _index is None:
+            # Nothing to serve yet: the first build blocks
+            _index_generation = _store_generation()
+            _index = _build_index()
+        elif _rebuild_writes is None:
+            generation = _store_generation()
+            if generation == _index_generation:
+                return _index
+            _rebuild_generation = generation
+            _rebuild_writes = []
+            threading.Thread(target=_rebuild_index, name="index-rebuild", daemon=True).start()
+        return _index
+
+def _rebuild_index():
+    global _index, _index_generation, _rebuild_generation, _rebuild_writes
+    try:
+        index = _build_index()
+        with _index_lock:
+            # Writes made here during the build may not be in it
+            for rid, ingredients in _rebuild_writes:
+                index.add(rid, ingredients)
+            _index, _index_generation = index, _rebuild_generation
+    except Exception as e:
+        logger.error(f"Ingredient index rebuild failed: {e}")
+    finally:
+        with _index_lock:
+            _rebuild_writes = None
+
+def _index_writes(ids: Sequence[str], ingredients: Sequence[List[str]], generation_before):
+    """Applies this process's store write to the index (once it exists)."""
+    global _index_generation, _rebuild_generation
+    with _index_lock:
+        if _index is None:
+            return
+        # As a rebuild would read them back from the metadata
+        entries = [(str(rid), _split_ingredients(", ".join(ings))) for rid, ings in zip(ids, ingredients)]
+        for rid, ings in entries:
+            _index.add(rid, ings)
+        generation = _store_generation()
+        # Only skip the rebuild if nobody else wrote since the index was current
+        if _index_generation == generation_before:
+            _index_generation = generation
+        if _rebuild_writes is not None:
+            _rebuild_writes.extend(entries)
+            if _rebuild_generation == generation_before:
+                _rebuild_generation = generation
+
+def _build_index() -> IngredientIndex:
+    col = _get_store()
+    index = IngredientIndex()
+    page, offset = 5000, 0
+    while True:
+        batch = col.get(include=['metadatas'], limit=page, offset=offset)
+        for rid, meta in zip(batch['ids'], batch['metadatas'] or []):
+            index.add(rid, _split_ingredients((meta or {}).get("ingredients", "")))
+        if len(batch['ids']) < page:
+            break
+        offset += page
+    return index
+
+def _store_generation():
+    return _get_store().generation()
+
+def _invalidate_retrievals():
+    # Entries are already unreachable after a write; this just frees them
+    _retrievals.clear()
+
+def normalize_ingredients(ingredients: List[str]) -> Tuple[str, ...]:
+    """Order- and case-insensitive key for an ingredient list."""
+    return tuple(sorted({" ".join(i.lower().split()) for i in ingredients if i.strip()}))
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "query_vectors": _query_vectors.stats(),
+        "retrievals": _retrievals.stats(),
+        "store_generation": _store.generation() if _store is not None else None,
+    }
+
+def semantic_string(title: str, ingredients: List[str]) -> str:
+    """Create a rich semantic string for embedding."""
+    return f"{title} | Ingredients: {', '.join(ingredients)}"
 
 def add_recipe(rid: str, title: str, text: str, ingredients: List[str]):
     """Adds a verified recipe to the vector store."""
     emb_model, col = _get_resources()
     
-    # Create a rich semantic string for embedding
-    semantic_string = f"{title} | Ingredients: {', '.join(ingredients)}"
-    vector = emb_model.encode([semantic_string], convert_to_numpy=True)[0].tolist()
+    vector = emb_model.encode([semantic_string(title, ingredients)], convert_to_numpy=True)[0].tolist()
     
+    generation = _store_generation()
     col.add(
         ids=[str(rid)],
         documents=[text],
         metadatas=[{"title": title, "ingredients": ", ".join(ingredients)}],
         embeddings=[vector]
     )
+    _index_writes([rid], [ingredients], generation)
+    _invalidate_retrievals()
+
+def get_content_hashes(ids: Sequence[str]) -> Dict[str, str]:
+    """Stored content hashes for the given ids (absent ids are omitted)."""
+    col = _get_store()
+    found = col.get(ids=list(ids), include=['metadatas'])
+    return {
+        rid: meta.get("content_hash", "")
+        for rid, meta in zip(found['ids'], found['metadatas'] or [])
+        if meta
+    }
+
+def upsert_recipes(ids: Sequence[str], titles: Sequence[str], texts: Sequence[str],
+                   ingredients: Sequence[List[str]], embeddings: np.ndarray,
+                   content_hashes: Optional[Sequence[str]] = None):
+    """
+    Bulk insert-or-update of pre-embedded recipes, split into the largest
+    batches the backend accepts. Store-only: the embedding model is not
+    loaded, so a seeding parent whose workers encode stays light.
+    """
+    col = _get_store()
+    metadatas = []
+    for i, (title, ings) in enumerate(zip(titles, ingredients)):
+        meta = {"title": title, "ingredients": ", ".join(ings)}
+        if content_hashes is not None:
+            meta["content_hash"] = content_hashes[i]
+        metadatas.append(meta)
+
+    # Largest batch the backend accepts in a single upsert
+    step = col.max_batch_size
+    generation = _store_generation()
+    for start in range(0, len(ids), step):
+        end = start + step
+        col.upsert(
+            ids=[str(rid) for rid in ids[start:end]],
+            documents=list(texts[start:end]),
+            metadatas=metadatas[start:end],
+            embeddings=embeddings[start:end]
+        )
+    _index_writes(ids, ingredients, generation)
+    _invalidate_retrievals()
 
 def query_similar(ingredients: List[str], top_k: int = 2) -> List[Dict]:
     """Finds recipes in the DB that match the input ingredients."""
+    with telemetry.request_scope(), telemetry.span("query_similar", top_k=top_k):
+        return _query_similar(ingredients, top_k)
+
+def _query_similar(ingredients: List[str], top_k: int) -> List[Dict]:
     emb_model, col = _get_resources()
     
-    query_text = "Recipes containing: " + ", ".join(ingredients)
-    query_vec = emb_model.encode([query_text], convert_to_numpy=True)[0].tolist()
+    key = normalize_ingredients(ingredients)
+    version = _store_generation()
+    cached = _retrievals.get((key, top_k, version))
+    telemetry.count("cache_requests_total", cache="retrieval", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return [dict(r) for r in cached]
+
+    query_vec = _query_vectors.get(key)
+    telemetry.count("cache_requests_total", cache="query_vector", result="miss" if query_vec is None else "hit")
+    if query_vec is None:
+        query_text = "Recipes containing: " + ", ".join(key)
+        with telemetry.span("embed_query"):
+            query_vec = emb_model.encode([query_text], convert_to_numpy=True)[0].tolist()
+        _query_vectors.put(key, query_vec)
     
+    with telemetry.span("vector_query", mode=RETRIEVAL_MODE):
+        if RETRIEVAL_MODE == "hybrid":
+            out = _hybrid_query(col, key, query_vec, top_k)
+        else:
+            out = _dense_query(col, query_vec, top_k)
+    _retrievals.put((key, top_k, version), out)
+    return [dict(r) for r in out]
+
+def query_similar_many(ingredient_lists: Sequence[List[str]], top_k: int = 2,
+                       batch_size: int = 512) -> List[List[Dict]]:
+    """
+    query_similar for many ingredient lists (meal plans, retrieval evals).
+
+    Per chunk of `batch_size` queries, the uncached query strings are
+    encoded in one batch and searched with one multi-vector store query
+    (one candidate fetch in hybrid mode). Both caches are consulted and
+    filled, duplicate lists are computed once, and results come back in
+    input order.
+    """
+    with telemetry.request_scope(), telemetry.span("query_similar_many", queries=len(ingredient_lists),
+                                                   top_k=top_k):
+        keys = [normalize_ingredients(ingredients) for ingredients in ingredient_lists]
+        results: Dict[Tuple[str, ...], List[Dict]] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), max(1, batch_size)):
+            results.update(_query_similar_batch(unique[start:start + batch_size], top_k))
+        return [[dict(r) for r in results[key]] for key in keys]
+
+def _query_similar_batch(keys: List[Tuple[str, ...]], top_k: int) -> Dict[Tuple[str, ...], List[Dict]]:
+    emb_model, col = _get_resources()
+    out: Dict[Tuple[str, ...], List[Dict]] = {}
+    todo = []
+    version = _store_generation()
+    for key in keys:
+        cached = _retrievals.get((key, top_k, version))
+        telemetry.count("cache_requests_total", cache="retrieval", result="miss" if cached is None else "hit")
+        if cached is not None:
+            out[key] = cached
+        else:
+            todo.append(key)
+    if not todo:
+        return out
+
+    vecs = {key: _query_vectors.get(key) for key in todo}
+    missing = [key for key, vec in vecs.items() if vec is None]
+    telemetry.count("cache_requests_total", len(todo) - len(missing), cache="query_vector", result="hit")
+    telemetry.count("cache_requests_total", len(missing), cache="query_vector", result="miss")
+    if missing:
+        texts = ["Recipes containing: " + ", ".join(key) for key in missing]
+        with telemetry.span("embed_query", queries=len(texts)):
+            encoded = emb_model.encode(texts, batch_size=128, convert_to_numpy=True)
+        for key, vec in zip(missing, encoded):
+            vecs[key] = vec.tolist()
+            _query_vectors.put(key, vecs[key])
+
+    query_vecs = [vecs[key] for key in todo]
+    with telemetry.span("vector_query", mode=RETRIEVAL_MODE, queries=len(todo)):
+        if RETRIEVAL_MODE == "hybrid":
+            found = _hybrid_query_many(col, todo, query_vecs, top_k)
+        else:
+            found = _dense_query_many(col, query_vecs, top_k)
+    for key, results in zip(todo, found):
+        _retrievals.put((key, top_k, version), results)
+        out[key] = results
+    return out
+
+def _result(rid: str, distance: float, meta: Dict, document: str) -> Dict:
+    meta = meta or {}
+    return {
+        "id": rid,
+        "score": distance,
+        "title": meta.get("title", "Unknown"),
+        "ingredients": meta.get("ingredients", ""),
+        "recipe_text": document
+    }
+
+def _dense_query(col, query_vec, top_k: int) -> List[Dict]:
+    return _dense_query_many(col, [query_vec], top_k)[0]
+
+def _dense_query_many(col, query_vecs: Sequence, top_k: int) -> List[List[Dict]]:
+    """One store query for all vectors; a result list per vector."""
     results = col.query(
-        query_embeddings=[query_vec], 
+        query_embeddings=list(query_vecs),
         n_results=top_k,
         include=['metadatas', 'documents', 'distances']
     )
-    
-    out = []
+
+    outs = [[] for _ in query_vecs]
     if results and results['ids']:
-        for i in range(len(results['ids'][0])):
-            meta = results['metadatas'][0][i]
-            out.append({
-                "id": results['ids'][0][i],
-                "score": results['distances'][0][i],
-                "title": meta.get("title", "Unknown"),
-                "ingredients": meta.get("ingredients", ""),
-                "recipe_text": results['documents'][0][i]
-            })
-    return out
\ No newline at end of file
+        for q, ids in enumerate(results['ids']):
+            for i in range(len(ids)):
+                outs[q].append(_result(
+                    ids[i], results['distances'][q][i],
+                    results['metadatas'][q][i], results['documents'][q][i]
+                ))
+    return outs
+
+def _hybrid_query(col, key: Tuple[str, ...], query_vec, top_k: int) -> List[Dict]:
+    """
+    Takes candidates by ingredient overlap from the inverted index, then
+    reranks only those by vector distance. Cost depends on the candidate
+    count, not the corpus size. Tops up from a dense query when too few
+    recipes share an ingredient.
+    """
+    return _hybrid_query_many(col, [key], [query_vec], top_k)[0]
+
+def _hybrid_query_many(col, keys: Sequence[Tuple[str, ...]], query_vecs: Sequence,
+                       top_k: int) -> List[List[Dict]]:
+    """_hybrid_query for many queries: one fetch of all candidates, one top-up query."""
+    index = _get_index()
+    candidates = [[rid for rid, _ in index.candidates(key, HYBRID_CANDIDATES)] for key in keys]
+    wanted = list(dict.fromkeys(rid for ids in candidates for rid in ids))
+    outs = [[] for _ in keys]
+    if wanted:
+        found = col.get(ids=wanted, include=['embeddings', 'metadatas', 'documents'])
+        row = {rid: i for i, rid in enumerate(found['ids'])}
+        emb = np.asarray(found['embeddings'], dtype=np.float32) if row else None
+        for q, ids in enumerate(candidates):
+            rows = [row[rid] for rid in ids if rid in row]
+            if not rows:
+                continue
+            # Squared L2, the same metric Chroma's default space reports
+            dists = ((emb[rows] - np.asarray(query_vecs[q], dtype=np.float32)) ** 2).sum(axis=1)
+            for i in np.argsort(dists)[:top_k]:
+                r = rows[i]
+                outs[q].append(_result(
+                    found['ids'][r], float(dists[i]),
+                    found['metadatas'][r], found['documents'][r]
+                ))
+
+    short = [q for q, out in enumerate(outs) if len(out) < top_k]
+    if short:
+        extra = _dense_query_many(col, [query_vecs[q] for q in short],
+                                  top_k + max(len(outs[q]) for q in short))
+        for q, more in zip(short, extra):
+            seen = {r["id"] for r in outs[q]}
+            outs[q].extend([r for r in more if r["id"] not in seen][:top_k - len(outs[q])])
+
+    for key, out in zip(keys, outs):
+        for r in out:
+            r["overlap"] = index.overlap(r["id"], key)
+    return outs
\ No newline at end of file
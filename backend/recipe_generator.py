@@ -1,18 +1,34 @@
+import html
+import logging
 import re
-from .rag_pipeline import query_similar
-from .llm import generate_text
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .config import (RESPONSE_CACHE_PATH, RESPONSE_CACHE_VARIANTS,
+                     RESPONSE_CACHE_MAX_MB, RESPONSE_CACHE_TTL_H, RECIPE_OUTPUT_MODE,
+                     RAG_SNIPPET_CHARS, RAG_TOP_K)
+from .rag_pipeline import query_similar, normalize_ingredients
+from .llm import (generate_text, generate_text_stream, register_prompt_prefix,
+                  model_fingerprint, SAMPLING_PARAMS, count_tokens, context_size,
+                  format_prompt)
+from .prompt_builder import build_prompt
+from . import telemetry
+from .response_cache import ResponseCache, make_key
+from .structured_output import RECIPE_SCHEMA_JSON, parse_partial
 
-# Updated Prompt to be cleaner
-PROMPT_TEMPLATE = """
-You are a professional Michelin-star chef. 
-I have the following ingredients: {ingredients}.
-Dietary Preferences: {prefs}.
+logger = logging.getLogger(__name__)
 
-Here is some context from my personal cookbook (use if relevant):
-{context}
+MAX_TOKENS = 1024
+
+# Opt-in store of generated recipes (RESPONSE_CACHE_PATH)
+_response_cache = None
+
+# Invariant instructions come first so their KV cache can be computed once
+# and reused; only the per-request part after it has to be prefilled.
+PROMPT_PREFIX = """
+You are a professional Michelin-star chef. 
 
 TASK:
-Create ONE single, highly detailed recipe.
+Create ONE single, highly detailed recipe from the ingredients below.
 Do NOT use bold asterisks (**) for the Title or Labels.
 Follow this format EXACTLY:
 
@@ -29,8 +45,37 @@ Time: [Prep & Cook Time] | Servings: [Number]
 ...
 
 Chef's Tip: [A professional secret tip]
+
+"""
+
+PROMPT_SUFFIX = """I have the following ingredients: {ingredients}.
+Dietary Preferences: {prefs}.
+
+Here is some context from my personal cookbook (use if relevant):
+{context}
+"""
+
+PROMPT_TEMPLATE = PROMPT_PREFIX + PROMPT_SUFFIX
+
+# "json" output mode: the grammar enforces the structure, so the prompt
+# only has to describe the fields
+PROMPT_PREFIX_JSON = """
+You are a professional Michelin-star chef. 
+
+TASK:
+Create ONE single, highly detailed recipe from the ingredients below.
+Answer with a JSON object: title, description (a short, mouth-watering
+summary), time (prep & cook time), servings, ingredients (items with
+quantities), instructions (one step per item) and tip (a professional
+secret tip). Plain text values, no markdown.
+
 """
 
+PROMPT_TEMPLATE_JSON = PROMPT_PREFIX_JSON + PROMPT_SUFFIX
+
+register_prompt_prefix(PROMPT_PREFIX)
+register_prompt_prefix(PROMPT_PREFIX_JSON)
+
 def clean_text(text):
     """
     Cleans up Markdown artifacts to ensure professional HTML rendering.
@@ -44,38 +89,46 @@ def clean_text(text):
     
     return text
 
-def generate_chef_response(ingredients: list, prefs: str = ""):
-    # 1. RAG Retrieval
-    similar_recipes = query_similar(ingredients, top_k=2)
-    
-    context_str = ""
-    for r in similar_recipes:
-        context_str += f"- {r['title']} (Ingredients: {r['ingredients']})\n"
-
-    # 2. Build Prompt
-    prompt = PROMPT_TEMPLATE.format(
-        ingredients=", ".join(ingredients),
-        prefs=prefs if prefs else "None",
-        context=context_str if context_str else "No prior recipes found."
-    )
+class RecipeFormatter:
+    """
+    Turns model output into the recipe card HTML one line at a time, so the
+    same parsing serves the blocking path (feed everything at once) and the
+    streaming path (feed tokens as they arrive).
+    """
 
-    # 3. Generate Raw Text
-    raw_text = generate_text(prompt)
+    def __init__(self):
+        self.title = "Chef's Special Creation"
+        self.body_lines: List[str] = []
+        self._title_found = False
+        self._pending = ""
 
-    # 4. Parse & Clean
-    lines = raw_text.strip().split('\n')
-    title = "Chef's Special Creation"
-    body_lines = []
-    
-    title_found = False
+    @property
+    def body(self) -> str:
+        # Join body lines
+        return "\n".join(self.body_lines)
+
+    def feed(self, text: str) -> bool:
+        """Buffers text; formats every completed line. True if the card changed."""
+        self._pending += text
+        changed = False
+        while "\n" in self._pending:
+            line, self._pending = self._pending.split("\n", 1)
+            changed |= self._format_line(line)
+        return changed
 
-    for line in lines:
+    def close(self) -> bool:
+        """Formats the trailing line that has no newline."""
+        line, self._pending = self._pending, ""
+        return self._format_line(line)
+
+    def _format_line(self, line: str) -> bool:
         line = clean_text(line.strip())
+        body_lines = self.body_lines
         
         # Extract Title
-        if not title_found and (line.startswith("Title:") or line.startswith("##")):
-            title = line.replace("Title:", "").replace("##", "").strip()
-            title_found = True
+        if not self._title_found and (line.startswith("Title:") or line.startswith("##")):
+            self.title = line.replace("Title:", "").replace("##", "").strip()
+            self._title_found = True
         # Format Description line specifically
         elif line.startswith("Description:"):
             # wrap 'Description:' in a span for CSS styling
@@ -96,10 +149,209 @@ def generate_chef_response(ingredients: list, prefs: str = ""):
             # Wrap numbered steps
             body_lines.append(f"<p class='step'>{line}</p>")
         else:
-            if line:
-                body_lines.append(f"<p>{line}</p>")
+            if not line:
+                return False
+            body_lines.append(f"<p>{line}</p>")
+        return True
+
+def render_structured(recipe: Dict[str, Any]) -> Tuple[str, str]:
+    """Recipe card (title, body HTML) from a RECIPE_SCHEMA object, possibly partial."""
+    def text(key):
+        return html.escape(str(recipe.get(key) or "")).strip()
+
+    title = text("title") or "Chef's Special Creation"
+    body_lines = []
+    if text("description"):
+        body_lines.append(f"<p class='recipe-desc'><span class='label'>Description:</span> {text('description')}</p>")
+    meta = [f"Time: {text('time')}" if text("time") else "",
+            f"Servings: {text('servings')}" if text("servings") else ""]
+    if any(meta):
+        body_lines.append(f"<p class='recipe-meta'>{' | '.join(m for m in meta if m)}</p>")
+    ingredients = [html.escape(str(i)).strip() for i in recipe.get("ingredients") or []]
+    if ingredients:
+        body_lines.append("<h3>Ingredients</h3>")
+        body_lines.extend(f"<li>{i}</li>" for i in ingredients if i)
+    steps = [html.escape(str(i)).strip() for i in recipe.get("instructions") or []]
+    if steps:
+        body_lines.append("<h3>Instructions</h3>")
+        body_lines.extend(f"<p class='step'>{n}. {step}</p>" for n, step in enumerate(steps, 1) if step)
+    if text("tip"):
+        body_lines.append(f"<p>Chef's Tip: {text('tip')}</p>")
+    return title, "\n".join(body_lines)
+
+class StructuredRecipeFormatter:
+    """
+    RecipeFormatter counterpart for "json" output mode: the card is rendered
+    from the schema-constrained recipe object, re-parsed as it streams in.
+    """
+
+    def __init__(self):
+        self.title = "Chef's Special Creation"
+        self.body = ""
+        self._text = ""
+
+    def feed(self, text: str) -> bool:
+        self._text += text
+        error = self._text.strip()
+        if error.startswith("System Error"):
+            # Not JSON: shown as RecipeFormatter shows it, under the default title
+            title, body = "Chef's Special Creation", f"<p>{html.escape(error)}</p>"
+        else:
+            recipe = parse_partial(self._text)
+            if recipe is None:
+                return False
+            title, body = render_structured(recipe)
+        changed = (title, body) != (self.title, self.body)
+        self.title, self.body = title, body
+        return changed
+
+    def close(self) -> bool:
+        return False
+
+def _formatter(mode: str):
+    return StructuredRecipeFormatter() if mode == "json" else RecipeFormatter()
+
+def _build_prompt(ingredients: list, prefs: str,
+                  template: str = PROMPT_TEMPLATE) -> Tuple[Dict[str, Any], List[Dict]]:
+    """
+    Retrieves similar recipes and fits the prompt into the context window.
+    Returns the prompt_builder plan (prompt, max_tokens, token counts) and
+    all retrieved recipes.
+    """
+    # 1. RAG Retrieval
+    similar_recipes = query_similar(ingredients, top_k=RAG_TOP_K)
+
+    # 2. Build Prompt within the token budgets
+    with telemetry.span("build_prompt"):
+        plan = build_prompt(template, ingredients, prefs, similar_recipes,
+                            count_tokens=count_tokens, n_ctx=context_size(),
+                            max_tokens=MAX_TOKENS, wrap=format_prompt)
+    telemetry.count("llm_prompt_tokens_total", plan["prompt_tokens"])
+    return plan, similar_recipes
+
+def _cached_response(cache: Optional[ResponseCache], key: Optional[str], fresh: bool) -> Optional[str]:
+    if cache is None or fresh:
+        return None
+    text = cache.get(key)
+    telemetry.count("cache_requests_total", cache="response", result="miss" if text is None else "hit")
+    return text
+
+def get_response_cache() -> Optional[ResponseCache]:
+    global _response_cache
+    if _response_cache is None and RESPONSE_CACHE_PATH:
+        _response_cache = ResponseCache(
+            RESPONSE_CACHE_PATH,
+            variants=RESPONSE_CACHE_VARIANTS,
+            max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+            ttl_s=RESPONSE_CACHE_TTL_H * 3600,
+        )
+    return _response_cache
+
+def _response_key(ingredients: list, prefs: str, plan: Dict[str, Any], template: str) -> str:
+    # Everything that shapes the output: request, retrieved context, prompt,
+    # model weights and sampling settings
+    return make_key(
+        ingredients=normalize_ingredients(ingredients),
+        prefs=" ".join(prefs.lower().split()),
+        context=[r["id"] for r in plan["recipes"]],
+        template=template,
+        model=model_fingerprint(),
+        sampling=SAMPLING_PARAMS,
+        max_tokens=plan["max_tokens"],
+        snippet_chars=RAG_SNIPPET_CHARS,
+    )
+
+def generate_chef_response(ingredients: list, prefs: str = "", fresh: bool = False,
+                           mode: str = RECIPE_OUTPUT_MODE):
+    """
+    `fresh` skips cached recipes (the new one is still stored). `mode` is
+    "text" (free-form, parsed line by line) or "json" (grammar-constrained).
+    """
+    with telemetry.request_scope(), telemetry.span("generate_chef_response", mode=mode):
+        return _generate_chef_response(ingredients, prefs, fresh, mode)
+
+def _generate_chef_response(ingredients: list, prefs: str, fresh: bool, mode: str):
+    template = PROMPT_TEMPLATE_JSON if mode == "json" else PROMPT_TEMPLATE
+    schema = RECIPE_SCHEMA_JSON if mode == "json" else None
+    plan, similar_recipes = _build_prompt(ingredients, prefs, template)
+
+    # 3. Generate Raw Text (or reuse a stored variant)
+    cache = get_response_cache()
+    key = _response_key(ingredients, prefs, plan, template) if cache else None
+    raw_text = _cached_response(cache, key, fresh)
+    if raw_text is None:
+        raw_text = generate_text(plan["prompt"], max_tokens=plan["max_tokens"], json_schema=schema)
+        logger.info(f"Recipe generated: {plan['prompt_tokens']} prompt tokens, "
+                    f"{count_tokens(raw_text) - 1} completion tokens")
+        if cache and not raw_text.startswith("System Error"):
+            cache.put(key, raw_text)
+
+    # 4. Parse & Clean
+    formatter = _formatter(mode)
+    formatter.feed(raw_text.strip())
+    formatter.close()
+
+    return formatter.title, formatter.body, similar_recipes
+
+def stream_chef_response(ingredients: list, prefs: str = "", fresh: bool = False,
+                         mode: str = RECIPE_OUTPUT_MODE) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of generate_chef_response.
+
+    Yields {"title", "body", "done": False} each time the card changes
+    (a completed line in "text" mode, every parsed piece in "json" mode),
+    then a final event with "done": True, the RAG recommendations and
+    latency metrics. "first_content_s" is the time to the first visible
+    content; "prompt_tokens" and "completion_tokens" count the tokens in
+    and out. A cached recipe is returned as the final event right away.
+    """
+    with telemetry.request_scope(), telemetry.span("generate_chef_response", mode=mode, stream=True):
+        yield from _stream_chef_response(ingredients, prefs, fresh, mode)
+
+def _stream_chef_response(ingredients: list, prefs: str, fresh: bool,
+                          mode: str) -> Iterator[Dict[str, Any]]:
+    start = time.perf_counter()
+    template = PROMPT_TEMPLATE_JSON if mode == "json" else PROMPT_TEMPLATE
+    schema = RECIPE_SCHEMA_JSON if mode == "json" else None
+    plan, similar_recipes = _build_prompt(ingredients, prefs, template)
+
+    cache = get_response_cache()
+    key = _response_key(ingredients, prefs, plan, template) if cache else None
+    cached = _cached_response(cache, key, fresh)
 
-    # Join body lines
-    clean_body = "\n".join(body_lines)
+    formatter = _formatter(mode)
+    first_content = None
+    completion_tokens = 0
+    if cached is not None:
+        formatter.feed(cached.strip())
+        first_content = time.perf_counter() - start
+    else:
+        pieces = []
+        for piece in generate_text_stream(plan["prompt"], max_tokens=plan["max_tokens"],
+                                          json_schema=schema):
+            pieces.append(piece)
+            if formatter.feed(piece):
+                if first_content is None:
+                    first_content = time.perf_counter() - start
+                yield {"title": formatter.title, "body": formatter.body, "done": False}
+        raw_text = "".join(pieces).strip()
+        # Chunks are not tokens; count as the blocking path does (minus BOS)
+        completion_tokens = count_tokens(raw_text) - 1 if raw_text else 0
+        if cache and raw_text and not raw_text.startswith("System Error"):
+            cache.put(key, raw_text)
+    if formatter.close() and first_content is None:
+        first_content = time.perf_counter() - start
 
-    return title, clean_body, similar_recipes
\ No newline at end of file
+    metrics = {"first_content_s": first_content, "total_s": time.perf_counter() - start,
+               "prompt_tokens": plan["prompt_tokens"], "completion_tokens": completion_tokens,
+               "prompt_sections": plan["sections"], "cached": cached is not None, "mode": mode}
+    logger.info(f"Recipe streamed ({mode}): first content {first_content}s, "
+                f"{plan['prompt_tokens']} prompt + {completion_tokens} completion tokens, "
+                f"total {metrics['total_s']:.1f}s")
+    yield {
+        "title": formatter.title,
+        "body": formatter.body,
+        "done": True,
+        "rag": similar_recipes,
+        "metrics": metrics,
+    }
\ No newline at end of file
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(**parts: Any) -> str:
+    """Stable hash of everything that determines a generated recipe."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite store of generated recipes with several variants per key.
+
+    A key only starts producing hits once it holds `variants` recipes, so
+    popular requests still show some variety. Entries expire after `ttl_s`,
+    and least recently used rows are evicted beyond `max_bytes`.
+    """
+
+    def __init__(self, path: str, variants: int = 3, max_bytes: int = 32 * 1024 * 1024,
+                 ttl_s: float = 7 * 24 * 3600):
+        self.variants = max(1, variants)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT, variant INTEGER, text TEXT, size INTEGER,"
+            " created REAL, last_access REAL, PRIMARY KEY (key, variant))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_resp_access ON responses(last_access)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ? AND created < ?",
+                             (key, now - self.ttl_s))
+            rows = self._db.execute(
+                "SELECT variant, text FROM responses WHERE key = ?", (key,)
+            ).fetchall()
+            if len(rows) < self.variants:
+                self._db.commit()
+                self.misses += 1
+                return None
+            variant, text = random.choice(rows)
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ? AND variant = ?",
+                             (now, key, variant))
+            self._db.commit()
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str):
+        """Adds a variant, replacing the oldest one once the key is full."""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT variant FROM responses WHERE key = ? ORDER BY created", (key,)
+            ).fetchall()
+            used = {r[0] for r in rows}
+            if len(rows) >= self.variants:
+                variant = rows[0][0]
+            else:
+                variant = next(v for v in range(self.variants) if v not in used)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, variant, text, size, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, variant, size in self._db.execute(
+            "SELECT key, variant, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ? AND variant = ?", (key, variant))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
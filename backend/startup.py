@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from .config import SEED_ON_START, SEED_DATA_FILE
+from .model_registry import warmup_models
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Reference point for the startup timings: the first import of this module,
+# which the app does before anything heavy
+BOOT = time.perf_counter()
+
+_lock = threading.Lock()
+_done = threading.Event()
+_thread: Optional[threading.Thread] = None
+_status: Dict[str, Any] = {
+    "phase": "idle",  # idle -> loading -> [seeding ->] warming -> ready | failed
+    "seed": None,
+    "error": None,
+    "first_paint_s": None,
+    "ready_s": None,
+}
+
+
+def _set(**fields: Any):
+    with _lock:
+        _status.update(fields)
+
+
+def status() -> Dict[str, Any]:
+    """Snapshot of the boot progress; "done" once it is ready or has failed."""
+    with _lock:
+        snap = dict(_status)
+    snap["done"] = _done.is_set()
+    snap["ready"] = snap["phase"] == "ready"
+    return snap
+
+
+def wait(timeout: Optional[float] = None) -> bool:
+    """Blocks until boot is done; False if `timeout` ran out first."""
+    return _done.wait(timeout)
+
+
+def mark_first_paint():
+    """Records the time to the first rendered page (once per process)."""
+    with _lock:
+        if _status["first_paint_s"] is not None:
+            return
+        _status["first_paint_s"] = elapsed = time.perf_counter() - BOOT
+    logger.info(f"First paint {elapsed:.2f}s after boot")
+    telemetry.record_span("startup_first_paint", elapsed)
+
+
+def start(seed: bool = SEED_ON_START):
+    """Starts the background boot once per process; later calls are no-ops."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, args=(seed,), name="startup", daemon=True)
+    _thread.start()
+
+
+def _run(seed: bool):
+    try:
+        telemetry.init()
+        # Heavy imports (torch, sentence-transformers, the vector store) happen
+        # here, not on the first click
+        _set(phase="loading")
+        from . import img_ingred_detection, recipe_generator  # noqa: F401
+        if seed:
+            _seed_if_needed()
+        _set(phase="warming")
+        warmup_models()
+        _set(phase="ready")
+    except Exception as e:
+        logger.exception("Startup failed")
+        _set(phase="failed", error=str(e))
+    finally:
+        elapsed = time.perf_counter() - BOOT
+        _set(ready_s=elapsed)
+        _done.set()
+        logger.info(f"Startup {_status['phase']} {elapsed:.2f}s after boot")
+        telemetry.record_span("startup_ready", elapsed, error=_status["error"])
+
+
+def _count_lines(path: str) -> int:
+    with open(path, "rb") as fh:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: fh.read(1 << 20), b""))
+
+
+def _seed_if_needed():
+    """Seeds an empty store, or resumes a seed that was interrupted."""
+    from . import rag_pipeline
+    from .bulk_ingest import DEFAULT_CHECKPOINT, bulk_load
+
+    _, store = rag_pipeline._get_resources()
+    if store.count() > 0 and not os.path.exists(DEFAULT_CHECKPOINT):
+        return
+    if not os.path.exists(SEED_DATA_FILE):
+        logger.warning(f"Vector store is empty and {SEED_DATA_FILE} is missing; skipping seed")
+        return
+    # Line count of a gzipped file is not known up front
+    total = None if SEED_DATA_FILE.endswith(".gz") else _count_lines(SEED_DATA_FILE)
+    _set(phase="seeding", seed={"added": 0, "skipped": 0, "invalid": 0, "line": 0, "total": total})
+    start = time.perf_counter()
+    counts = bulk_load(SEED_DATA_FILE, progress=lambda c: _set(seed={**c, "total": total}))
+    _set(seed={**counts, "total": total})
+    telemetry.record_span("startup_seed", time.perf_counter() - start, added=counts["added"])
\ No newline at end of file
@@ -0,0 +1,75 @@
+import json
+from typing import Any, Dict, Optional
+
+# Compact recipe the model is constrained to produce in "json" output mode.
+# Bounded lengths keep the grammar from rambling, and the closing brace is a
+# hard stop: nothing can be generated after it.
+RECIPE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "maxLength": 80},
+        "description": {"type": "string", "maxLength": 300},
+        "time": {"type": "string", "maxLength": 40},
+        "servings": {"type": "integer"},
+        "ingredients": {
+            "type": "array",
+            "items": {"type": "string", "maxLength": 80},
+            "minItems": 1,
+            "maxItems": 15,
+        },
+        "instructions": {
+            "type": "array",
+            "items": {"type": "string", "maxLength": 300},
+            "minItems": 1,
+            "maxItems": 10,
+        },
+        "tip": {"type": "string", "maxLength": 200},
+    },
+    "required": ["title", "description", "time", "servings", "ingredients", "instructions", "tip"],
+}
+
+RECIPE_SCHEMA_JSON = json.dumps(RECIPE_SCHEMA)
+
+
+def _closers(text: str) -> Optional[str]:
+    """The quote/brackets that would close every construct left open in `text`."""
+    stack = []
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if escaped:
+        return None
+    return ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def parse_partial(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses a JSON object that may still be streaming in by closing whatever
+    is open. A dangling tail that cannot be closed (a half-written key, a
+    trailing comma or colon) is dropped. None until a prefix parses.
+    """
+    text = text.strip()
+    # Dangling tails are at most a key long, so a few cuts suffice
+    for cut in range(len(text), max(0, len(text) - 64), -1):
+        head = text[:cut].rstrip().rstrip(",:").rstrip()
+        closers = _closers(head)
+        if closers is None:
+            continue
+        try:
+            obj = json.loads(head + closers)
+        except ValueError:
+            continue
+        return obj if isinstance(obj, dict) else None
+    return None
\ No newline at end of file
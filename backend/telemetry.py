@@ -0,0 +1,220 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from .config import TELEMETRY, TELEMETRY_JSONL, TELEMETRY_PORT
+
+logger = logging.getLogger(__name__)
+
+ENABLED = TELEMETRY or bool(TELEMETRY_JSONL) or TELEMETRY_PORT > 0
+
+# Prometheus' default latency buckets (seconds), plus a few for LLM calls
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+_counters: Dict[_Key, float] = {}
+# key -> [bucket counts..., +Inf count, sum]
+_histograms: Dict[_Key, list] = {}
+_lock = threading.Lock()
+_jsonl = None
+_server = None
+
+
+def _key(name: str, labels: Dict[str, Any]) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_scope(rid: Optional[str] = None):
+    """
+    Gives the enclosed work a request id (kept if one is already set), which
+    every span recorded inside it carries.
+    """
+    if not ENABLED or (rid is None and _request_id.get() is not None):
+        yield _request_id.get()
+        return
+    token = _request_id.set(rid or uuid.uuid4().hex[:12])
+    try:
+        yield _request_id.get()
+    finally:
+        try:
+            _request_id.reset(token)
+        except ValueError:
+            pass  # a generator finalized from another context
+
+
+def set_request_id(rid: str):
+    """Tags the current context, e.g. a fresh copy owned by one HTTP request."""
+    if ENABLED:
+        _request_id.set(rid)
+
+
+def count(name: str, value: float = 1, **labels: Any):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels: Any):
+    """Adds `value` to a histogram."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        hist[bisect_left(BUCKETS, value)] += 1
+        hist[-1] += value
+
+
+def record_span(name: str, seconds: float, error: Optional[str] = None, **attrs: Any):
+    """Records a timing measured elsewhere as if it were a span."""
+    if not ENABLED:
+        return
+    observe("span_seconds", seconds, span=name)
+    if error:
+        count("span_errors_total", span=name)
+    if _jsonl is not None:
+        event = {"ts": time.time(), "request_id": _request_id.get(), "span": name,
+                 "duration_s": round(seconds, 6)}
+        if attrs:
+            event["attrs"] = attrs
+        if error:
+            event["error"] = error
+        line = json.dumps(event, default=str) + "\n"
+        with _lock:
+            _jsonl.write(line)
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any):
+        """Adds attributes known only inside the span (token counts, hits)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.name, time.perf_counter() - self.start,
+                    error=exc_type.__name__ if exc_type else None, **self.attrs)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs: Any):
+    """`with span("query_similar"):` times the block; a shared no-op when disabled."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """Counters and histograms in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE chef_{name} counter")
+            typed.add(name)
+        lines.append(f"chef_{name}{_labels(labels)} {value:g}")
+    for (name, labels), hist in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE chef_{name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, n in zip(BUCKETS, hist):
+            cumulative += n
+            le = 'le="%g"' % bound
+            lines.append(f"chef_{name}_bucket{_labels(labels, le)} {cumulative}")
+        cumulative += hist[len(BUCKETS)]
+        le = 'le="+Inf"'
+        lines.append(f"chef_{name}_bucket{_labels(labels, le)} {cumulative}")
+        lines.append(f"chef_{name}_sum{_labels(labels)} {hist[-1]:g}")
+        lines.append(f"chef_{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _metrics_server(port: int):
+    # http.server is only imported when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+
+
+def init():
+    """Opens the JSONL sink and the /metrics endpoint once per process."""
+    global _jsonl, _server
+    if not ENABLED:
+        return
+    with _lock:
+        if TELEMETRY_JSONL and _jsonl is None:
+            _jsonl = open(TELEMETRY_JSONL, "a", encoding="utf-8", buffering=1)
+        if TELEMETRY_PORT > 0 and _server is None:
+            try:
+                _server = _metrics_server(TELEMETRY_PORT)
+            except OSError as e:
+                logger.warning(f"Metrics endpoint on port {TELEMETRY_PORT} unavailable: {e}")
+                return
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            logger.info(f"Serving metrics at http://127.0.0.1:{TELEMETRY_PORT}/metrics")
\ No newline at end of file
@@ -0,0 +1,341 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process are still serialized by the RLock
+    fcntl = None
+
+# Results use Chroma's response shapes so callers work with any backend:
+#   get()   -> {"ids": [...], "metadatas": [...], "documents": [...], "embeddings": ...}
+#   query() -> the same keys plus "distances", each a list per query embedding
+DEFAULT_INCLUDE = ("metadatas", "documents", "distances")
+
+# Rows scored per matmul block; a float16 store is widened to float32 one
+# block (~6 MB at 384-d) at a time rather than the whole file per query
+_BLOCK_ROWS = 4096
+
+
+class VectorStore(ABC):
+    """Minimal storage interface behind add_recipe / query_similar."""
+
+    max_batch_size = 5000
+
+    @abstractmethod
+    def count(self) -> int: ...
+
+    @abstractmethod
+    def add(self, ids: Sequence[str], documents: Sequence[str],
+            metadatas: Sequence[Dict[str, Any]], embeddings) -> None:
+        """Inserts new ids; existing ids are left untouched."""
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], documents: Sequence[str],
+               metadatas: Sequence[Dict[str, Any]], embeddings) -> None:
+        """Inserts new ids and overwrites existing ones."""
+
+    @abstractmethod
+    def get(self, ids: Optional[Sequence[str]] = None, include: Sequence[str] = ("metadatas",),
+            limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def query(self, query_embeddings, n_results: int = 2,
+              include: Sequence[str] = DEFAULT_INCLUDE) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def generation(self) -> Any:
+        """Cheap token that changes whenever any process writes to the store."""
+
+
+class ChromaStore(VectorStore):
+    """ChromaDB persistent collection."""
+
+    def __init__(self, path: str, collection_name: str):
+        import chromadb
+        # PersistentClient ensures data is saved to disk
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self._generation_file = os.path.join(path, f".generation-{collection_name}")
+        try:
+            self.max_batch_size = self.client.get_max_batch_size()
+        except Exception:
+            pass
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids, documents, metadatas, embeddings):
+        self.collection.add(ids=list(ids), documents=list(documents),
+                            metadatas=list(metadatas), embeddings=embeddings)
+        self._bump_generation()
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.collection.upsert(ids=list(ids), documents=list(documents),
+                               metadatas=list(metadatas), embeddings=embeddings)
+        self._bump_generation()
+
+    def _bump_generation(self):
+        # A file next to the collection, so writers in other processes are seen
+        tmp = f"{self._generation_file}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(f"{time.time_ns()}-{os.getpid()}")
+        os.replace(tmp, self._generation_file)
+
+    def generation(self) -> str:
+        try:
+            with open(self._generation_file, "r", encoding="utf-8") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return ""
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=0):
+        return self.collection.get(ids=list(ids) if ids is not None else None,
+                                   include=list(include), limit=limit, offset=offset)
+
+    def query(self, query_embeddings, n_results=2, include=DEFAULT_INCLUDE):
+        return self.collection.query(query_embeddings=query_embeddings,
+                                     n_results=n_results, include=list(include))
+
+
+class NumpyStore(VectorStore):
+    """
+    In-memory exact search over a memory-mapped vector file.
+
+    Layout of `path`:
+      header.json   - {"dim": int, "dtype": "float32" | "float16"}
+      vectors.bin   - row-major L2-normalized vectors, one row per id
+      records.jsonl - append-only [id, document, metadata] lines; a later
+                      line for the same id replaces the earlier one
+
+    Vectors are normalized on write, so a query is one matmul plus an
+    argpartition. Distances are squared L2 between unit vectors
+    (2 - 2 * cosine), which matches Chroma's default metric for the
+    already-normalized MiniLM embeddings. Another process writing to the
+    same directory is picked up on the next read; writers from different
+    processes are serialized with an exclusive lock on `path`/.lock.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._records_read = 0
+        os.makedirs(path, exist_ok=True)
+        self._load_header()
+        self._refresh()
+
+    # --- persistence ---
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_header(self):
+        try:
+            with open(self._file("header.json"), "r", encoding="utf-8") as fh:
+                header = json.load(fh)
+            self.dim = header["dim"]
+            self.dtype = np.dtype(header["dtype"])
+        except FileNotFoundError:
+            pass
+
+    def _write_header(self, dim: int):
+        self.dim = dim
+        # Written aside and renamed so readers never see a partial header
+        tmp = self._file(f"header.json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"dim": dim, "dtype": self.dtype.name}, fh)
+        os.replace(tmp, self._file("header.json"))
+
+    def _refresh(self):
+        """Reads records appended since the last call (by us or another process)."""
+        records = self._file("records.jsonl")
+        if not os.path.exists(records) or os.path.getsize(records) == self._records_read:
+            return
+        if self.dim is None:
+            self._load_header()
+        with open(records, "r", encoding="utf-8") as fh:
+            fh.seek(self._records_read)
+            for line in fh:
+                if not line.endswith("\n"):
+                    break  # partially written by a concurrent writer
+                self._records_read += len(line.encode("utf-8"))
+                rid, document, metadata = json.loads(line)
+                if rid in self._row:
+                    row = self._row[rid]
+                    self._documents[row] = document
+                    self._metadatas[row] = metadata
+                else:
+                    self._row[rid] = len(self._ids)
+                    self._ids.append(rid)
+                    self._documents.append(document)
+                    self._metadatas.append(metadata)
+        self._map_vectors()
+
+    def _map_vectors(self):
+        if self.dim is None or not self._ids:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype,
+                                  mode="r", shape=(len(self._ids), self.dim))
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, open(self._file(".lock"), "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _prepare(self, embeddings) -> np.ndarray:
+        vecs = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs / np.maximum(norms, 1e-12)
+
+    def _write(self, ids, documents, metadatas, embeddings, overwrite: bool):
+        vecs = self._prepare(embeddings)
+        with self._write_lock():
+            # Rows appended by other processes must be counted before ours
+            self._refresh()
+            if self.dim is None:
+                self._load_header()
+            if self.dim is None:
+                self._write_header(vecs.shape[1])
+            elif vecs.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d embeddings, got {vecs.shape[1]}")
+
+            new_rows, updates, lines = [], [], []
+            pending = {}
+            for rid, doc, meta, vec in zip(ids, documents, metadatas, vecs):
+                rid = str(rid)
+                if rid in self._row:
+                    if not overwrite:
+                        continue
+                    updates.append((self._row[rid], vec))
+                elif rid in pending:
+                    if not overwrite:
+                        continue
+                    new_rows[pending[rid]] = vec
+                else:
+                    pending[rid] = len(new_rows)
+                    new_rows.append(vec)
+                lines.append(json.dumps([rid, doc, meta or {}], ensure_ascii=False) + "\n")
+
+            if updates:
+                rows = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r+",
+                                 shape=(len(self._ids), self.dim))
+                for row, vec in updates:
+                    rows[row] = vec
+                rows.flush()
+                del rows
+            if new_rows:
+                with open(self._file("vectors.bin"), "ab") as fh:
+                    fh.write(np.asarray(new_rows, dtype=self.dtype).tobytes())
+            # Records go last: readers only see rows whose vectors exist
+            if lines:
+                with open(self._file("records.jsonl"), "a", encoding="utf-8") as fh:
+                    fh.writelines(lines)
+            self._refresh()
+
+    # --- VectorStore API ---
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    def generation(self) -> int:
+        # records.jsonl only grows, and every add/upsert appends to it
+        try:
+            return os.path.getsize(self._file("records.jsonl"))
+        except FileNotFoundError:
+            return 0
+
+    def add(self, ids, documents, metadatas, embeddings):
+        self._write(ids, documents, metadatas, embeddings, overwrite=False)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self._write(ids, documents, metadatas, embeddings, overwrite=True)
+
+    def _select(self, rows: List[int], include: Sequence[str]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"ids": [self._ids[r] for r in rows]}
+        if "metadatas" in include:
+            out["metadatas"] = [self._metadatas[r] for r in rows]
+        if "documents" in include:
+            out["documents"] = [self._documents[r] for r in rows]
+        if "embeddings" in include:
+            out["embeddings"] = (np.asarray(self._vectors[rows], dtype=np.float32)
+                                 if rows else np.empty((0, self.dim or 0), dtype=np.float32))
+        return out
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=0):
+        with self._lock:
+            self._refresh()
+            if ids is None:
+                end = len(self._ids) if limit is None else offset + limit
+                rows = list(range(offset, min(end, len(self._ids))))
+            else:
+                rows = [self._row[str(rid)] for rid in ids if str(rid) in self._row]
+            return self._select(rows, include)
+
+    def query(self, query_embeddings, n_results=2, include=DEFAULT_INCLUDE):
+        # Only the refresh and the row lookups are locked: rows are append-only
+        # and each refresh maps a new array, so the snapshot can be scored while
+        # other threads query or write
+        with self._lock:
+            self._refresh()
+            vectors = self._vectors
+        result: Dict[str, Any] = {"ids": []}
+        for key in include:
+            result[key] = []
+        if vectors is None:
+            return result
+
+        queries = self._prepare(query_embeddings)
+        k = min(n_results, vectors.shape[0])
+        # Running top-k per query, merged block by block, so memory stays
+        # at one block of scores however many queries and rows there are
+        top_sims = np.empty((queries.shape[0], 0), dtype=np.float32)
+        top_rows = np.empty((queries.shape[0], 0), dtype=np.int64)
+        for start in range(0, vectors.shape[0], _BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            # (n_queries x dim) @ (dim x block) -> cosine similarity
+            sims = queries @ block.T
+            if sims.shape[1] > k:
+                rows = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                sims = np.take_along_axis(sims, rows, axis=1)
+            else:
+                rows = np.broadcast_to(np.arange(sims.shape[1]), sims.shape)
+            sims = np.concatenate([top_sims, sims], axis=1)
+            rows = np.concatenate([top_rows, start + rows], axis=1)
+            if sims.shape[1] > k:
+                keep = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                sims = np.take_along_axis(sims, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            top_sims, top_rows = sims, rows
+        # Best first, ties in row order
+        order = np.lexsort((top_rows, -top_sims))
+        top_sims = np.take_along_axis(top_sims, order, axis=1)
+        top_rows = np.take_along_axis(top_rows, order, axis=1)
+        with self._lock:
+            picks = [self._select(top.tolist(), include) for top in top_rows]
+        for row_sims, picked in zip(top_sims, picks):
+            result["ids"].append(picked["ids"])
+            for key in include:
+                if key == "distances":
+                    result[key].append((2.0 - 2.0 * row_sims).tolist())
+                else:
+                    result[key].append(picked[key])
+        return result
@@ -0,0 +1,96 @@
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+
+# A float16 matrix is scored in blocks, widened to float32 (for BLAS) a few
+# MB at a time instead of all at once
+_BLOCK_ROWS = 4096
+
+
+class VocabMatcher:
+    """
+    Vectorized thresholding + top-k over a large ingredient vocabulary.
+
+    Terms are stored grouped by category, so a category filter is a slice of
+    the embedding matrix rather than a gather. Embeddings are L2-normalized
+    and used as given, typically a read-only memmap shared by every process:
+    no private copy is made. A float32 matrix is scored with one BLAS matrix
+    multiply; NumPy has no BLAS path for float16, so a float16 matrix is
+    widened block by block (several times slower).
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], embeddings: np.ndarray,
+                 thresholds: Optional[Dict[str, float]] = None,
+                 default_threshold: float = 0.22):
+        self.terms: List[str] = []
+        self.category_slices: Dict[str, slice] = {}
+        row_thresholds = []
+        thresholds = thresholds or {}
+        for category, items in categories.items():
+            start = len(self.terms)
+            self.terms.extend(items)
+            self.category_slices[category] = slice(start, len(self.terms))
+            row_thresholds.extend([thresholds.get(category, default_threshold)] * len(items))
+
+        if embeddings.shape[0] != len(self.terms):
+            raise ValueError(
+                f"Expected {len(self.terms)} embedding rows, got {embeddings.shape[0]}"
+            )
+        if embeddings.dtype not in (np.float16, np.float32):
+            embeddings = embeddings.astype(np.float32)
+        self.embeddings = embeddings
+        self.row_thresholds = np.asarray(row_thresholds, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def scores(self, query_emb: np.ndarray, rows: slice = slice(None)) -> np.ndarray:
+        """Cosine scores (n_queries x n_rows) for normalized query embeddings."""
+        query = np.atleast_2d(query_emb).astype(np.float32, copy=False)
+        if self.embeddings.dtype == np.float32:
+            return query @ np.asarray(self.embeddings[rows]).T
+
+        matrix = self.embeddings[rows]
+        out = np.empty((query.shape[0], matrix.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], _BLOCK_ROWS):
+            block = matrix[start:start + _BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + block.shape[0]] = query @ block.T
+        return out
+
+    def _rows_for(self, categories: Optional[Iterable[str]]) -> List[slice]:
+        if categories is None:
+            return [slice(0, len(self.terms))]
+        return [self.category_slices[c] for c in categories if c in self.category_slices]
+
+    def match(self, query_emb: np.ndarray, top_k: Optional[int] = None,
+              categories: Optional[Iterable[str]] = None,
+              threshold: Optional[float] = None) -> List[Set[str]]:
+        """
+        Returns, per query row, the terms scoring above their category
+        threshold (or `threshold` for all rows, if given). With `top_k`, only
+        the k best-scoring hits are kept.
+        """
+        query = np.atleast_2d(query_emb)
+        parts = [(rows, self.scores(query, rows)) for rows in self._rows_for(categories)]
+        return [self._select(q, parts, top_k, threshold) for q in range(query.shape[0])]
+
+    def match_scores(self, scores: np.ndarray, top_k: Optional[int] = None,
+                     threshold: Optional[float] = None) -> List[Set[str]]:
+        """Like match(), for precomputed (n x vocab) scores, e.g. merged tiles."""
+        scores = np.atleast_2d(scores)
+        parts = [(slice(0, len(self.terms)), scores)]
+        return [self._select(q, parts, top_k, threshold) for q in range(scores.shape[0])]
+
+    def _select(self, q: int, parts, top_k: Optional[int],
+                threshold: Optional[float]) -> Set[str]:
+        hit_idx, hit_scores = [], []
+        for rows, scores in parts:
+            row = scores[q]
+            limit = self.row_thresholds[rows] if threshold is None else threshold
+            idx = np.flatnonzero(row > limit)
+            hit_idx.append(idx + rows.start)
+            hit_scores.append(row[idx])
+        idx = np.concatenate(hit_idx) if hit_idx else np.empty(0, dtype=np.int64)
+        if top_k is not None and len(idx) > top_k:
+            best = np.argpartition(-np.concatenate(hit_scores), top_k - 1)[:top_k]
+            idx = idx[best]
+        return {self.terms[i] for i in idx}
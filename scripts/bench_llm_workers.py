@@ -0,0 +1,85 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+PROMPT = "Suggest a quick dinner using tomato, onion and paneer."
+
+
+def run_config(workers: int, users: int, requests: int, max_tokens: int):
+    """Runs in a fresh process so LLM_WORKERS is read for this configuration."""
+    os.environ["LLM_WORKERS"] = str(workers)
+    os.environ["LLM_QUEUE_SIZE"] = str(max(requests, 1))
+    from backend.llm import generate_text_stream, load_llm_pool, scheduler_stats
+
+    pool = load_llm_pool()
+    if not pool:
+        return None
+
+    def one_request(_):
+        start = time.perf_counter()
+        first = None
+        pieces = []
+        for piece in generate_text_stream(PROMPT, max_tokens=max_tokens):
+            if first is None:
+                first = time.perf_counter() - start
+            pieces.append(piece)
+        # Chunks are not tokens: count with the model's tokenizer
+        text = "".join(pieces).encode("utf-8")
+        tokens = len(pool[0].tokenize(text, add_bos=False, special=True))
+        return first or 0.0, time.perf_counter() - start, tokens
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(one_request, range(requests)))
+    wall = time.perf_counter() - start
+
+    ttft = sorted(r[0] for r in results)
+    total = sorted(r[1] for r in results)
+    tokens = sum(r[2] for r in results)
+    stats = scheduler_stats()
+    return {
+        "tok_s": tokens / wall,
+        "ttft_p50": ttft[len(ttft) // 2],
+        "lat_p50": total[len(total) // 2],
+        "lat_p95": total[min(len(total) - 1, int(len(total) * 0.95))],
+        "wait_p95": stats.get("wait_p95_s", 0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM worker count vs throughput/latency")
+    parser.add_argument("--workers", default=None,
+                        help="Comma-separated instance counts (default: 1,2,4 up to the core count)")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = ([int(w) for w in args.workers.split(",")] if args.workers
+              else [k for k in (1, 2, 4, 8) if k <= cores])
+    print(f"{cores} cores, {args.users} concurrent users, {args.requests} requests")
+    print(f"{'workers':>7} {'threads':>7} {'tok/s':>8} {'TTFT p50':>9} "
+          f"{'lat p50':>8} {'lat p95':>8} {'wait p95':>9}")
+
+    ctx = multiprocessing.get_context("spawn")
+    for workers in counts:
+        with ctx.Pool(1) as pool:
+            r = pool.apply(run_config, (workers, args.users, args.requests, args.max_tokens))
+        if r is None:
+            print("❌ Model could not be loaded.")
+            return
+        print(f"{workers:>7} {max(1, cores // workers):>7} {r['tok_s']:>8.1f} {r['ttft_p50']:>8.1f}s "
+              f"{r['lat_p50']:>7.1f}s {r['lat_p95']:>7.1f}s {r['wait_p95']:>8.1f}s")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+from backend.img_ingred_detection import SYNONYMS, VOCAB
+from backend.keyword_matcher import build_matcher
+
+FILLER = [
+    "net", "wt", "price", "best", "before", "organic", "product", "of", "india",
+    "ingredients", "store", "in", "a", "cool", "dry", "place", "mfd", "by",
+    "nutrition", "facts", "energy", "kcal", "protein", "g", "batch", "no",
+]
+
+
+def legacy_match(text, vocab):
+    """The original per-term loop from ocr_detect."""
+    found = set()
+    for v in vocab:
+        if f" {v} " in f" {text} " or v in text.split():
+            found.add(v)
+    return found
+
+
+def make_vocab(size):
+    vocab = list(VOCAB)
+    i = 0
+    while len(vocab) < size:
+        vocab.append(f"brand{i} {random.choice(VOCAB)}")
+        i += 1
+    return vocab[:size]
+
+
+def make_text(vocab, words):
+    tokens = [random.choice(FILLER) for _ in range(words)]
+    for _ in range(max(1, words // 50)):
+        tokens.insert(random.randrange(len(tokens)), random.choice(vocab))
+    return " ".join(tokens)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR keyword matcher micro-benchmark")
+    parser.add_argument("--vocab-sizes", default="70,1000,10000")
+    parser.add_argument("--words", type=int, default=400, help="OCR text length in words")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'vocab':>8} {'build ms':>10} {'legacy ms':>10} {'automaton ms':>13} {'speedup':>8}")
+    for size in (int(s) for s in args.vocab_sizes.split(",")):
+        vocab = make_vocab(size)
+        text = make_text(vocab, args.words)
+
+        start = time.perf_counter()
+        matcher = build_matcher(vocab, SYNONYMS)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        legacy_ms = timeit(lambda: legacy_match(text, vocab), args.repeat)
+        new_ms = timeit(lambda: matcher.find(text), args.repeat)
+        print(f"{size:>8} {build_ms:>10.1f} {legacy_ms:>10.3f} {new_ms:>13.3f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+from PIL import Image, ImageEnhance
+
+SOURCE_IMAGE = os.path.join(ROOT, "images", "img_with_mul_ing.png")
+
+
+def make_photo(megapixels: float) -> bytes:
+    """Upscales a fixture into a phone-sized JPEG."""
+    src = Image.open(SOURCE_IMAGE).convert("RGB")
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    img = src.resize((width, width * 3 // 4), Image.Resampling.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def legacy(image_bytes: bytes):
+    """What extract_ingredients used to do before CLIP/Tesseract ran."""
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    ImageEnhance.Contrast(image).enhance(1.8)
+    # CLIP's own preprocessing resize of the full-size image
+    image.resize((224, 224), Image.Resampling.BICUBIC)
+
+
+def pipeline(image_bytes: bytes):
+    from backend.image_preprocess import prepare_views
+    clip_view, ocr_view = prepare_views(image_bytes)
+    ImageEnhance.Contrast(ocr_view).enhance(1.8)
+
+
+def run_mode(mode: str, image_bytes: bytes, repeat: int):
+    """Runs in a fresh process so ru_maxrss is this mode's own peak."""
+    fn = legacy if mode == "legacy" else pipeline
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fn(image_bytes)  # warm imports
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(image_bytes)
+    elapsed = (time.perf_counter() - start) / repeat
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed * 1000, peak_kb / 1024, (peak_kb - baseline_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload preprocessing benchmark")
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    image_bytes = make_photo(args.megapixels)
+    print(f"Synthetic {args.megapixels:.0f} MP JPEG, {len(image_bytes) / 1e6:.1f} MB")
+    print(f"{'mode':>10} {'ms/photo':>10} {'peak RSS MB':>12} {'delta MB':>10}")
+
+    ctx = multiprocessing.get_context("spawn")
+    for mode in ("legacy", "pipeline"):
+        with ctx.Pool(1) as pool:
+            ms, peak, delta = pool.apply(run_mode, (mode, image_bytes, args.repeat))
+        print(f"{mode:>10} {ms:>10.1f} {peak:>12.1f} {delta:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+SAMPLE_REQUESTS = [
+    (["tomato", "onion", "paneer"], "Vegetarian"),
+    (["chicken", "rice", "garlic"], ""),
+    (["potato", "cumin", "peas"], "Vegan"),
+    (["egg", "spinach", "cheese"], "Keto"),
+]
+
+
+def run_config(draft: str, draft_tokens: int, snippet_chars: int, rounds: int, max_tokens: int):
+    """Runs in a fresh process: the draft model is chosen when the LLM loads."""
+    os.environ["LLM_DRAFT"] = draft
+    os.environ["LLM_DRAFT_TOKENS"] = str(draft_tokens)
+    # Same prompts for every configuration, including the retrieved recipe text
+    os.environ["RAG_SNIPPET_CHARS"] = str(snippet_chars)
+    from backend.llm import generate_text_stream, load_llm
+    from backend.recipe_generator import _build_prompt
+
+    tokenizer = load_llm()
+    if tokenizer is None:
+        return None
+    prompts = [_build_prompt(ing, prefs)[0]["prompt"] for ing, prefs in SAMPLE_REQUESTS]
+
+    decode_tokens, decode_s, ttft = 0, 0.0, []
+    for _ in range(rounds):
+        for prompt in prompts:
+            start = time.perf_counter()
+            first = None
+            pieces = []
+            for piece in generate_text_stream(prompt, max_tokens=max_tokens, use_prefix_cache=False):
+                if first is None:
+                    first = time.perf_counter()
+                pieces.append(piece)
+            end = time.perf_counter()
+            if first is not None:
+                ttft.append(first - start)
+                # A chunk can carry several accepted draft tokens: count tokens,
+                # less the first one (it belongs to the TTFT)
+                text = "".join(pieces).encode("utf-8")
+                decode_tokens += len(tokenizer.tokenize(text, add_bos=False, special=True)) - 1
+                decode_s += end - first
+    return decode_tokens / decode_s if decode_s else 0.0, sum(ttft) / max(1, len(ttft))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt-lookup speculative decoding benchmark")
+    parser.add_argument("--draft-tokens", default="2,4,10",
+                        help="Comma-separated draft lengths to try")
+    parser.add_argument("--snippet-chars", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    configs = [("none", 0)] + [("prompt_lookup", int(n)) for n in args.draft_tokens.split(",")]
+    print(f"{'mode':>14} {'draft':>6} {'decode tok/s':>13} {'TTFT s':>7}")
+    ctx = multiprocessing.get_context("spawn")
+    baseline = None
+    for draft, n in configs:
+        with ctx.Pool(1) as pool:
+            r = pool.apply(run_config, (draft, n, args.snippet_chars, args.rounds, args.max_tokens))
+        if r is None:
+            print("❌ Model could not be loaded.")
+            return
+        tok_s, ttft = r
+        baseline = baseline or tok_s
+        speedup = f"x{tok_s / baseline:.2f}" if baseline else ""
+        print(f"{draft:>14} {n:>6} {tok_s:>13.1f} {ttft:>7.2f} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
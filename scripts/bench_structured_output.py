@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+from backend.llm import generate_text, load_llm
+from backend.recipe_generator import MAX_TOKENS, PROMPT_TEMPLATE, PROMPT_TEMPLATE_JSON
+from backend.structured_output import RECIPE_SCHEMA_JSON
+
+SAMPLE_REQUESTS = [
+    ("tomato, onion, paneer", "Vegetarian"),
+    ("chicken, rice, garlic", "None"),
+    ("potato, cumin, peas", "Vegan"),
+    ("egg, spinach, cheese", "Keto"),
+]
+
+
+def run_mode(llm, mode: str, rounds: int):
+    template = PROMPT_TEMPLATE_JSON if mode == "json" else PROMPT_TEMPLATE
+    schema = RECIPE_SCHEMA_JSON if mode == "json" else None
+    tokens, seconds, valid = [], [], 0
+    for _ in range(rounds):
+        for ing, prefs in SAMPLE_REQUESTS:
+            prompt = template.format(ingredients=ing, prefs=prefs, context="No prior recipes found.")
+            start = time.perf_counter()
+            text = generate_text(prompt, max_tokens=MAX_TOKENS, json_schema=schema)
+            seconds.append(time.perf_counter() - start)
+            tokens.append(len(llm.tokenize(text.encode("utf-8"), add_bos=False)))
+            if mode == "json":
+                try:
+                    json.loads(text)
+                    valid += 1
+                except ValueError:
+                    pass
+    n = len(seconds)
+    return sum(tokens) / n, sum(seconds) / n, max(tokens), (valid / n if mode == "json" else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Free-form vs grammar-constrained recipe output")
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+
+    llm = load_llm()
+    if llm is None:
+        print("❌ Model could not be loaded.")
+        return
+
+    print(f"{'mode':>6} {'avg tokens':>11} {'max tokens':>11} {'avg s':>7} {'valid JSON':>11}")
+    for mode in ("text", "json"):
+        avg_tokens, avg_s, max_tokens, valid = run_mode(llm, mode, args.rounds)
+        valid_str = f"{valid:.0%}" if valid is not None else "-"
+        print(f"{mode:>6} {avg_tokens:>11.0f} {max_tokens:>11} {avg_s:>7.1f} {valid_str:>11}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Deterministic stand-ins for the CLIP, MiniLM and GGUF models, used by
+`benchmark.py --mode stub` so pipeline regressions can be measured offline
+without downloading weights. Outputs depend only on the inputs.
+"""
+import hashlib
+import re
+import zlib
+from typing import Any, Dict, Iterator, List, Union
+import numpy as np
+from PIL import Image
+
+STUB_RECIPE = """Title: Stub Kitchen Curry
+Description: A deterministic recipe used to benchmark the pipeline.
+Time: 15 min prep, 25 min cook | Servings: 4
+
+### Ingredients
+- 2 tbsp oil
+- 1 tsp cumin seeds
+- 1 onion, chopped
+- 2 tomatoes, chopped
+- 3 potatoes, cubed
+- 1/2 tsp turmeric
+- Salt to taste
+
+### Instructions
+1. Heat the oil and add the cumin seeds until they sizzle.
+2. Add the onion and cook until translucent.
+3. Stir in the tomatoes, turmeric and salt; cook until soft.
+4. Add the potatoes and a cup of water, cover and simmer until tender.
+5. Garnish with coriander and serve hot.
+
+Chef's Tip: Bloom the spices in hot oil first for a deeper aroma.
+"""
+
+
+def _digest(item: Union[str, Image.Image]) -> bytes:
+    if isinstance(item, Image.Image):
+        return hashlib.sha256(item.tobytes()).digest()
+    return hashlib.sha256(str(item).encode("utf-8")).digest()
+
+
+class StubEncoder:
+    """SentenceTransformer stand-in: unit vectors seeded by a hash of the input."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def encode(self, items, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **_: Any) -> np.ndarray:
+        single = isinstance(items, (str, Image.Image))
+        rows = []
+        for item in ([items] if single else items):
+            seed = int.from_bytes(_digest(item)[:8], "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            rows.append(vec / np.linalg.norm(vec))
+        out = np.stack(rows) if rows else np.empty((0, self.dim), dtype=np.float32)
+        return out[0] if single else out
+
+
+class StubLlama:
+    """
+    llama_cpp.Llama stand-in: whitespace tokenization and a canned recipe,
+    streamed one word per chunk, cut at `max_tokens`.
+    """
+
+    def __init__(self, n_ctx: int = 2048):
+        self._n_ctx = n_ctx
+        self.input_ids: List[int] = []
+        self.draft_model = None
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        ids = [zlib.crc32(w) % 32000 for w in text.split()]
+        return ([1] if add_bos else []) + ids
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens: List[int]):
+        self.input_ids = list(tokens)
+
+    def save_state(self) -> List[int]:
+        return list(self.input_ids)
+
+    def load_state(self, state: List[int]):
+        self.input_ids = list(state)
+
+    def create_completion(self, prompt: str, max_tokens: int = 16, stream: bool = False,
+                          **_: Any) -> Union[Dict[str, Any], Iterator[Dict[str, Any]]]:
+        self.input_ids = self.tokenize(prompt.encode("utf-8"))
+        pieces = re.findall(r"\S+\s*", STUB_RECIPE)[:max_tokens]
+        if stream:
+            return ({"choices": [{"text": p}]} for p in pieces)
+        return {"choices": [{"text": "".join(pieces)}]}
+
+
+def install(registry, llm_workers: int, n_ctx: int):
+    """Points the model registry at the stubs (before anything is loaded)."""
+    registry.register("clip", lambda: StubEncoder(512), replace=True)
+    registry.register("minilm", lambda: StubEncoder(384), replace=True)
+    registry.register("llm", lambda: [StubLlama(n_ctx) for _ in range(llm_workers)], replace=True)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+import numpy as np
+from backend.vector_store import ChromaStore, NumpyStore
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def make_store(engine: str, path: str):
+    if engine == "numpy":
+        return NumpyStore(path)
+    if engine == "numpy16":
+        return NumpyStore(path, dtype="float16")
+    return ChromaStore(path, "bench")
+
+
+def fill(store, size: int, rng):
+    step = min(store.max_batch_size, 20000)
+    for start in range(0, size, step):
+        n = min(step, size - start)
+        vecs = rng.standard_normal((n, DIM)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        ids = [f"r{start + i}" for i in range(n)]
+        store.upsert(ids, [f"recipe {i}" for i in ids],
+                     [{"title": i, "ingredients": "tomato, onion"} for i in ids], vecs)
+
+
+def bench(engine: str, size: int, queries: int, top_k: int):
+    rng = np.random.default_rng(0)
+    path = tempfile.mkdtemp(prefix=f"bench_{engine}_")
+    try:
+        store = make_store(engine, path)
+        start = time.perf_counter()
+        fill(store, size, rng)
+        build_s = time.perf_counter() - start
+
+        q = rng.standard_normal((queries, DIM)).astype(np.float32)
+        store.query([q[0].tolist()], n_results=top_k)  # warm up
+        latencies = []
+        for vec in q:
+            start = time.perf_counter()
+            store.query([vec.tolist()], n_results=top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        lat = np.array(latencies)
+        return build_s, np.percentile(lat, 50), np.percentile(lat, 95)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store engine benchmark")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--engines", default="chroma,numpy,numpy16")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'engine':>8} {'recipes':>9} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for engine in args.engines.split(","):
+            build_s, p50, p95 = bench(engine, size, args.queries, args.top_k)
+            print(f"{engine:>8} {size:>9} {build_s:>9.1f} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
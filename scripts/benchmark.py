@@ -0,0 +1,281 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+# Setup paths to allow importing from 'backend'
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+import numpy as np
+
+IMAGES = sorted(glob.glob(os.path.join(ROOT, "images", "*")))
+SEED_FILE = os.path.join(ROOT, "seed_data", "indian_recipes.jsonl")
+# Stub CLIP scores are noise, so the full flow falls back to these
+FALLBACK_INGREDIENTS = ["potato", "onion", "tomato", "cumin"]
+QUERIES = [
+    ["potato", "onion", "tomato"],
+    ["rice", "cumin", "ghee"],
+    ["paneer", "spinach", "garlic"],
+    ["chicken", "yogurt", "ginger"],
+]
+STAGES = ["decode", "visual", "ocr", "encode", "query", "prefill", "decode_llm", "parse", "flow"]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(samples_s: List[float], items: int = 0, elapsed_s: float = 0.0) -> Dict[str, Any]:
+    """Percentiles in ms; throughput is items (default: samples) per second."""
+    ms = np.asarray(samples_s) * 1000
+    items = items or len(samples_s)
+    elapsed_s = elapsed_s or float(np.sum(samples_s))
+    return {
+        "n": len(samples_s),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "throughput_per_s": items / elapsed_s if elapsed_s > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _repeat(fn: Callable[[], Any], iterations: int) -> List[float]:
+    fn()  # warm-up: lazy loads and first-call costs are not part of the stage
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _configure(mode: str, workdir: str):
+    """Environment for a reproducible run; must happen before importing backend."""
+    os.environ["CHROMA_DIR"] = os.path.join(workdir, "chroma")
+    os.environ["VECTOR_STORE_DIR"] = os.path.join(workdir, "vectors")
+    # Result caches would turn every repeat into a lookup
+    for var in ("DETECT_CACHE_SIZE", "QUERY_CACHE_SIZE", "RETRIEVAL_CACHE_SIZE"):
+        os.environ[var] = "0"
+    for var in ("DETECT_CACHE_PATH", "RESPONSE_CACHE_PATH"):
+        os.environ.pop(var, None)
+    if mode == "stub":
+        model_path = os.path.join(workdir, "stub.gguf")
+        with open(model_path, "wb") as fh:
+            fh.write(b"stub")
+        os.environ["HF_GGUF_MODEL_PATH"] = model_path
+        os.environ["VECTOR_BACKEND"] = "numpy"
+        os.environ["RECIPE_OUTPUT_MODE"] = "text"
+        os.environ["LLM_DRAFT"] = "none"
+        # Keep stub vocab embeddings out of the real cache directory
+        os.environ["VOCAB_CACHE_DIR"] = os.path.join(workdir, "vocab")
+
+
+def run(mode: str, workdir: str, iterations: int, llm_requests: int, max_tokens: int,
+        stages: List[str]) -> Dict[str, Any]:
+    """Seeds a scratch store in `workdir` from the fixtures and times each stage."""
+    _configure(mode, workdir)
+
+    from backend import img_ingred_detection as detection
+    from backend import llm, rag_pipeline
+    from backend.bulk_ingest import bulk_load
+    from backend.image_preprocess import prepare_views
+    from backend.model_registry import registry
+    from backend.recipe_generator import RecipeFormatter, _build_prompt, stream_chef_response
+
+    if mode == "stub":
+        import bench_stubs
+        bench_stubs.install(registry, llm_workers=llm.LLM_WORKERS, n_ctx=llm.LLM_N_CTX)
+
+    start = time.perf_counter()
+    bulk_load(SEED_FILE, resume=False, checkpoint_path=os.path.join(workdir, "seed.json"))
+    seed_s = time.perf_counter() - start
+
+    images = [open(path, "rb").read() for path in IMAGES]
+    views = [prepare_views(b) for b in images]
+    results: Dict[str, Any] = {}
+
+    def cycle(items):
+        state = {"i": 0}
+        def next_item():
+            item = items[state["i"] % len(items)]
+            state["i"] += 1
+            return item
+        return next_item
+
+    if "decode" in stages:
+        nxt = cycle(images)
+        results["decode"] = summarize(_repeat(lambda: prepare_views(nxt()), iterations))
+    if "visual" in stages:
+        nxt = cycle([v[0] for v in views])
+        results["visual"] = summarize(_repeat(lambda: detection.visual_detect(nxt()), iterations))
+    if "ocr" in stages:
+        nxt = cycle([v[1] for v in views])
+        results["ocr"] = summarize(_repeat(lambda: detection.ocr_detect(nxt()), iterations))
+
+    emb_model, store = rag_pipeline._get_resources()
+    query_texts = ["Recipes containing: " + ", ".join(q) for q in QUERIES]
+    if "encode" in stages:
+        nxt = cycle(query_texts)
+        results["encode"] = summarize(_repeat(
+            lambda: emb_model.encode([nxt()], convert_to_numpy=True), iterations))
+    if "query" in stages:
+        vectors = [emb_model.encode([t], convert_to_numpy=True)[0].tolist() for t in query_texts]
+        nxt = cycle(vectors)
+        results["query"] = summarize(_repeat(
+            lambda: store.query(query_embeddings=[nxt()], n_results=2), iterations))
+
+    texts = []
+    if {"prefill", "decode_llm", "parse"} & set(stages):
+        prompts = [_build_prompt(q, "")[0]["prompt"] for q in QUERIES]
+        ttft, gaps, tokens, decode_s = [], [], 0, 0.0
+        for n in range(llm_requests + 1):
+            start = time.perf_counter()
+            last, pieces = None, []
+            for piece in llm.generate_text_stream(prompts[n % len(prompts)], max_tokens=max_tokens):
+                now = time.perf_counter()
+                if last is None:
+                    first = now
+                    if n:
+                        ttft.append(now - start)
+                elif n:
+                    gaps.append(now - last)
+                last = now
+                pieces.append(piece)
+            if n and last is not None:
+                # Chunks are not tokens; the first token belongs to the prefill
+                text = "".join(pieces).encode("utf-8")
+                tokens += len(llm.load_llm().tokenize(text, add_bos=False, special=True)) - 1
+                decode_s += last - first
+            texts.append("".join(pieces))  # request 0 is the warm-up
+        if ttft:
+            results["prefill"] = summarize(ttft)
+        if gaps:
+            results["decode_llm"] = summarize(gaps, items=tokens, elapsed_s=decode_s)
+
+    if "parse" in stages and texts:
+        def parse(text=cycle(texts)):
+            formatter = RecipeFormatter()
+            formatter.feed(text())
+            formatter.close()
+        results["parse"] = summarize(_repeat(parse, iterations))
+
+    if "flow" in stages:
+        nxt = cycle(images)
+        def flow():
+            found = detection.extract_ingredients(nxt()) or FALLBACK_INGREDIENTS
+            for _event in stream_chef_response(found, "", fresh=True):
+                pass
+        results["flow"] = summarize(_repeat(flow, max(1, llm_requests)))
+
+    return {
+        "meta": {
+            "mode": mode,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "iterations": iterations,
+            "llm_requests": llm_requests,
+            "max_tokens": max_tokens,
+            "seed_s": seed_s,
+        },
+        "stages": results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, floor_ms: float) -> int:
+    """Prints per-stage changes; returns the number of regressions."""
+    regressions = 0
+    print(f"{'stage':>11} {'metric':>7} {'base':>10} {'new':>10} {'change':>8}")
+    for stage in STAGES:
+        if stage not in base["stages"] or stage not in new["stages"]:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            old, cur = base["stages"][stage][metric], new["stages"][stage][metric]
+            change = (cur - old) / old if old else 0.0
+            # Sub-`floor_ms` differences are timer noise, whatever the ratio
+            flag = change > threshold and cur - old > floor_ms
+            regressions += flag
+            print(f"{stage:>11} {metric[:-3]:>7} {old:>10.2f} {cur:>10.2f} {change:>+8.1%}"
+                  f"{'  REGRESSION' if flag else ''}")
+    old_rss, cur_rss = base["peak_rss_mb"], new["peak_rss_mb"]
+    rss_change = (cur_rss - old_rss) / old_rss if old_rss else 0.0
+    rss_flag = rss_change > threshold
+    regressions += rss_flag
+    print(f"{'peak RSS':>11} {'MB':>7} {old_rss:>10.1f} {cur_rss:>10.1f} {rss_change:>+8.1%}"
+          f"{'  REGRESSION' if rss_flag else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage pipeline latency benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Benchmark the pipeline stages")
+    p_run.add_argument("--mode", choices=["stub", "real"], default="stub",
+                       help="stub: deterministic offline models; real: the configured models")
+    p_run.add_argument("--iterations", type=int, default=20)
+    p_run.add_argument("--llm-requests", type=int, default=4)
+    p_run.add_argument("--max-tokens", type=int, default=128)
+    p_run.add_argument("--stages", default=",".join(STAGES))
+    p_run.add_argument("--output", help="Write the JSON report here (default: stdout)")
+
+    p_cmp = sub.add_parser("compare", help="Flag regressions between two reports")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown")
+    p_cmp.add_argument("--floor-ms", type=float, default=0.5, help="Ignore smaller absolute changes")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.base, "r", encoding="utf-8") as fh:
+            base = json.load(fh)
+        with open(args.new, "r", encoding="utf-8") as fh:
+            new = json.load(fh)
+        if base["meta"]["mode"] != new["meta"]["mode"]:
+            print(f"⚠️ Comparing a {base['meta']['mode']} run with a {new['meta']['mode']} run")
+        regressions = compare(base, new, args.threshold, args.floor_ms)
+        print(f"{regressions} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+    workdir = tempfile.mkdtemp(prefix="chef_bench_")
+    try:
+        report = run(args.mode, workdir, args.iterations, args.llm_requests, args.max_tokens,
+                     [s.strip() for s in args.stages.split(",") if s.strip()])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+        print(f"✅ Wrote {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
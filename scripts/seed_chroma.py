@@ -1,4 +1,5 @@
-import json
+import argparse
+import logging
 import os
 import sys
 
@@ -9,58 +10,42 @@ HERE = os.path.dirname(os.path.abspath(__file__))
 ROOT = os.path.dirname(HERE)
 sys.path.append(ROOT)
 
-from backend.rag_pipeline import add_recipe
+from backend.bulk_ingest import bulk_load
 
 # Path to the data file
 DATA_FILE = os.path.join(ROOT, "seed_data", "indian_recipes.jsonl")
 
-def seed():
+def seed(data_file: str = DATA_FILE, batch_size: int = 1024, workers: int = 1, resume: bool = True):
     # Check if file exists
-    if not os.path.exists(DATA_FILE):
-        print(f"❌ Error: Data file not found at: {DATA_FILE}")
+    if not os.path.exists(data_file):
+        print(f"❌ Error: Data file not found at: {data_file}")
         print("Please ensure 'indian_recipes.jsonl' is inside the 'seed_data' folder.")
         return
 
-    print(f"🌱 Reading recipes from: {DATA_FILE}")
+    print(f"🌱 Reading recipes from: {data_file}")
     print("⏳ Seeding ChromaDB...")
     
-    count = 0
-    
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as fh:
-            for line in fh:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                try:
-                    obj = json.loads(line)
-                    
-                    # Extract fields with fail-safes
-                    # Use provided ID, or generate one from title if missing
-                    title = obj.get("title", "Untitled Recipe")
-                    rid = str(obj.get("id") or title[:12].replace(" ", "_"))
-                    
-                    # Some datasets use 'text' others use 'instructions'
-                    text = obj.get("text") or obj.get("instructions") or ""
-                    
-                    ingredients = obj.get("ingredients", [])
-                    
-                    # Only add if valid data exists
-                    if text:
-                        add_recipe(rid, title, text, ingredients)
-                        print(f"  + Added: {title}")
-                        count += 1
-                        
-                except json.JSONDecodeError:
-                    print(f"  ⚠️ Skipping invalid JSON line")
-                except Exception as e:
-                    print(f"  ⚠️ Error adding line: {e}")
-
+        # Streams the file, encodes in large batches (optionally across
+        # processes), upserts in bulk and checkpoints so reruns resume
+        stats = bulk_load(data_file, batch_size=batch_size, workers=workers, resume=resume)
     except Exception as e:
         print(f"critical error reading file: {e}")
+        return
 
-    print(f"✅ Seeding Complete. Total recipes indexed: {count}")
+    if stats["invalid"]:
+        print(f"  ⚠️ Skipped {stats['invalid']} invalid lines")
+    if stats["skipped"]:
+        print(f"  = {stats['skipped']} recipes unchanged since last seed")
+    print(f"✅ Seeding Complete. Total recipes indexed: {stats['added']}")
 
 if __name__ == "__main__":
-    seed()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the recipe vector store from JSONL")
+    parser.add_argument("data_file", nargs="?", default=DATA_FILE, help="Plain or .gz JSONL file")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Recipes per encode/upsert batch")
+    parser.add_argument("--workers", type=int, default=1, help="Encoder processes")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    seed(args.data_file, batch_size=args.batch_size, workers=args.workers, resume=not args.no_resume)
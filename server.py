@@ -0,0 +1,279 @@
+"""
+Headless HTTP API for AI Chef Pro, alongside the Streamlit app.
+
+    uvicorn server:app --host 0.0.0.0 --port 8000 --workers 2
+
+Blocking model calls run on bounded thread pools ("lanes"); a lane that
+already has too much waiting work answers 503 instead of queueing without
+limit. Each worker process loads its own models but reads the same on-disk
+vector store and (when configured) detection/response caches.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from backend.config import (RAG_TOP_K, RECIPE_OUTPUT_MODE, SERVER_DETECT_WORKERS, SERVER_RETRIEVE_WORKERS,
+                            SERVER_GENERATE_WORKERS, SERVER_MAX_PENDING, SERVER_MAX_UPLOAD_MB)
+from backend.img_ingred_detection import extract_ingredients_detailed, get_detection_cache
+from backend.llm import scheduler_stats
+from backend.llm_scheduler import GenerationTimeout, SchedulerBusy
+from backend.model_registry import registry
+from backend.rag_pipeline import cache_stats, query_similar
+from backend.recipe_generator import get_response_cache, stream_chef_response
+from backend import startup, telemetry
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+# How often a non-streaming /recipe checks whether its client is still there
+_DISCONNECT_POLL_S = 0.5
+
+
+class Lane:
+    """A thread pool with an admission limit on running + waiting calls."""
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max(workers, max_pending)
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"api-{name}")
+
+    def _admit(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                telemetry.count("api_rejected_total", lane=self.name)
+                raise HTTPException(503, f"{self.name} is busy, retry shortly",
+                                    headers={"Retry-After": "1"})
+            self.pending += 1
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args: Any, context: Optional[contextvars.Context] = None) -> Any:
+        """Runs `fn(*args)` on the lane in `context` (default: a copy of the caller's)."""
+        self._admit()
+        try:
+            ctx = context or contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self._pool, ctx.run, fn, *args)
+        finally:
+            self._release()
+
+    def submit(self, fn: Callable, *args: Any):
+        """Fire-and-forget cleanup; bypasses the admission limit."""
+        self._pool.submit(fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+lanes = {
+    "detect": Lane("detect", SERVER_DETECT_WORKERS, SERVER_MAX_PENDING),
+    "retrieve": Lane("retrieve", SERVER_RETRIEVE_WORKERS, SERVER_MAX_PENDING),
+    "generate": Lane("generate", SERVER_GENERATE_WORKERS, SERVER_MAX_PENDING),
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Probes answer while the models load; /readyz flips once warmup is done.
+    # Seeding is left to the app or scripts/seed_chroma.py, not every worker
+    startup.start(seed=False)
+    yield
+    for lane in lanes.values():
+        lane.shutdown()
+
+
+app = FastAPI(title="AI Chef Pro API", lifespan=lifespan)
+
+
+class RetrieveRequest(BaseModel):
+    ingredients: List[str] = Field(min_length=1)
+    top_k: int = Field(RAG_TOP_K, ge=1, le=20)
+
+
+class RecipeRequest(BaseModel):
+    ingredients: List[str] = Field(min_length=1)
+    prefs: str = ""
+    fresh: bool = False
+    mode: str = Field(RECIPE_OUTPUT_MODE, pattern="^(text|json)$")
+    stream: bool = False
+
+
+def _request_context(request: Request) -> contextvars.Context:
+    """Context for the request's blocking work, carrying its request id."""
+    ctx = contextvars.copy_context()
+    rid = request.headers.get("x-request-id")
+    if rid:
+        ctx.run(telemetry.set_request_id, rid[:64])
+    return ctx
+
+
+def _clean_ingredients(ingredients: List[str]) -> List[str]:
+    cleaned = [i.strip() for i in ingredients if i.strip()]
+    if not cleaned:
+        raise HTTPException(422, "ingredients must contain at least one non-empty item")
+    return cleaned
+
+
+@app.exception_handler(SchedulerBusy)
+async def _scheduler_busy(request: Request, exc: SchedulerBusy):
+    return JSONResponse({"detail": "The LLM queue is full, retry shortly"}, status_code=503,
+                        headers={"Retry-After": "5"})
+
+
+@app.exception_handler(GenerationTimeout)
+async def _generation_timeout(request: Request, exc: GenerationTimeout):
+    return JSONResponse({"detail": f"Generation timed out: {exc}"}, status_code=504)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the event loop is serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the MODEL_WARMUP models are loaded."""
+    status = startup.status()
+    if not status["ready"]:
+        return JSONResponse(status, status_code=503)
+    return status
+
+
+@app.get("/stats")
+async def stats():
+    response_cache, detection_cache = get_response_cache(), get_detection_cache()
+    return {
+        "startup": startup.status(),
+        "models": registry.stats(),
+        "scheduler": scheduler_stats(),
+        "retrieval_cache": cache_stats(),
+        # None when the cache is disabled
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "detection_cache": detection_cache.stats() if detection_cache is not None else None,
+        "lanes": {name: lane.stats() for name, lane in lanes.items()},
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(telemetry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/detect")
+async def detect(request: Request):
+    """Detects ingredients in a raw image body (any format PIL decodes)."""
+    limit = int(SERVER_MAX_UPLOAD_MB * 1024 * 1024)
+    too_large = HTTPException(413, f"Image larger than {SERVER_MAX_UPLOAD_MB:g} MB")
+    # Refuse on the declared size before reading anything; chunked uploads
+    # are capped while they stream in
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise too_large
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise too_large
+        chunks.append(chunk)
+    image_bytes = b"".join(chunks)
+    if not image_bytes:
+        raise HTTPException(400, "Send the image as the request body")
+    ctx = _request_context(request)
+    return await lanes["detect"].run(extract_ingredients_detailed, image_bytes, context=ctx)
+
+
+@app.post("/retrieve")
+async def retrieve(body: RetrieveRequest, request: Request):
+    ingredients = _clean_ingredients(body.ingredients)
+    ctx = _request_context(request)
+    recipes = await lanes["retrieve"].run(query_similar, ingredients, body.top_k, context=ctx)
+    return {"recipes": recipes}
+
+
+@app.post("/recipe")
+async def recipe(body: RecipeRequest, request: Request):
+    """
+    Generates a recipe. With "stream": true the response is NDJSON: one
+    {"title", "body", "done": false} line per card update, then the final
+    event with "done": true, the RAG recommendations and metrics.
+    """
+    ingredients = _clean_ingredients(body.ingredients)
+    ctx = _request_context(request)
+    lane = lanes["generate"]
+    events = ctx.run(stream_chef_response, ingredients, body.prefs, body.fresh, body.mode)
+    # Steps may land on different lane threads; never two at once, nor a step and close
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            return ctx.run(next, events, _END)
+
+    cancelled = threading.Event()
+
+    def drain():
+        # Stops between events once the client has gone; close() then
+        # cancels the LLM request
+        last = None
+        with lock:
+            while not cancelled.is_set():
+                event = ctx.run(next, events, _END)
+                if event is _END:
+                    break
+                last = event
+        return last
+
+    def close():
+        # Cancels the LLM request if it is still queued or running
+        with lock:
+            ctx.run(events.close)
+
+    if not body.stream:
+        task = asyncio.ensure_future(lane.run(drain))
+        try:
+            while not task.done():
+                if await request.is_disconnected():
+                    cancelled.set()
+                    break
+                await asyncio.wait({task}, timeout=_DISCONNECT_POLL_S)
+            return await task
+        finally:
+            lane.submit(close)
+
+    try:
+        # The first event is awaited here so a full queue is still a 503
+        first = await lane.run(step)
+    except BaseException:
+        lane.submit(close)
+        raise
+
+    async def ndjson():
+        event = first
+        try:
+            while event is not _END:
+                yield json.dumps(event) + "\n"
+                if event["done"]:
+                    break
+                event = await lane.run(step)
+        except (SchedulerBusy, GenerationTimeout, HTTPException) as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield json.dumps({"done": True, "error": type(e).__name__, "detail": detail}) + "\n"
+        finally:
+            # Also runs when the client disconnects mid-stream
+            lane.submit(close)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
\ No newline at end of file